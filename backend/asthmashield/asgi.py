@@ -0,0 +1,21 @@
+"""
+ASGI config for asthmashield project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'asthmashield.settings')
+
+application = get_asgi_application()
+
+# Warm the app's caches only when serving requests
+from asthmashield_app.apps import warm_up  # noqa: E402
+
+warm_up()
@@ -0,0 +1,14 @@
+"""
+Celery application for AsthmaShield background tasks
+"""
+
+import os
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'asthmashield.settings')
+
+app = Celery('asthmashield')
+
+# Read CELERY_* entries from Django settings
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -13,4 +13,9 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'asthmashield.settings')
 
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+
+# Warm the app's caches only when serving requests
+from asthmashield_app.apps import warm_up  # noqa: E402
+
+warm_up()
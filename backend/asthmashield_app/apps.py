@@ -1,6 +1,26 @@
+import logging
+
 from django.apps import AppConfig
 
+logger = logging.getLogger(__name__)
+
+
+def warm_up():
+    """Preload caches for the web server; called from asgi.py/wsgi.py, not from ready(), so
+    manage.py commands and workers skip it"""
+    # Warm the model cache so the first prediction request doesn't pay for unpickling
+    from .ml_model.model import load_model
+    try:
+        load_model()
+    except Exception as e:
+        # A missing or corrupt model must not stop the server; predictions report the error
+        logger.warning(f"Could not preload the prediction model: {e}")
+    
+    # Likewise JIT-compile the local report search instead of doing it inside a request
+    from .data_collection import warm_up as warm_up_reports
+    warm_up_reports()
+
 
 class AsthmashieldAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'asthmashield_app'
\ No newline at end of file
+    name = 'asthmashield_app'
@@ -2,165 +2,423 @@
 Data collection module for crowdsourced asthma symptom reporting
 """
 
-import json
+import atexit
 import csv
+import hashlib
 import os
+import sqlite3
+import threading
+import uuid
+import numpy as np
+import pandas as pd
+from contextlib import closing
 from datetime import datetime
 from django.conf import settings
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Memory-map up to this many bytes of the reports database for read queries
+MMAP_SIZE = 256 * 1024 * 1024
+
+# Bit i of a symptom mask is set when SYMPTOM_ORDER[i] is reported
+SYMPTOM_ORDER = ('wheezing', 'shortness_of_breath', 'chest_tightness', 'coughing', 'difficulty_sleeping')
+SYMPTOM_WEIGHTS = np.array([3, 3, 2, 2, 1], dtype=np.int8)
+
+# Severity score and category for every possible symptom mask
+SEVERITY_TABLE = (((np.arange(32)[:, None] >> np.arange(5)) & 1) * SYMPTOM_WEIGHTS).sum(axis=1).astype(np.int8)
+CATEGORY_TABLE = np.where(SEVERITY_TABLE >= 5, 'High', np.where(SEVERITY_TABLE >= 3, 'Moderate', 'Low'))
+SEVERITY_CATEGORIES = ('Low', 'Moderate', 'High')
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.0
+
+def _haversine_numpy(latitude, longitude, latitudes, longitudes):
+    """Great-circle distance in km from one point to arrays of points"""
+    phi1 = np.radians(latitude)
+    phi2 = np.radians(latitudes)
+    dphi = phi2 - phi1
+    dlambda = np.radians(longitudes - longitude)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _haversine_batch(latitude, longitude, latitudes, longitudes):
+        """Great-circle distance in km, fused into one loop without temporary arrays"""
+        distances = np.empty(latitudes.shape[0])
+        phi1 = np.radians(latitude)
+        cos_phi1 = np.cos(phi1)
+        for i in range(latitudes.shape[0]):
+            phi2 = np.radians(latitudes[i])
+            dphi = phi2 - phi1
+            dlambda = np.radians(longitudes[i] - longitude)
+            a = np.sin(dphi / 2) ** 2 + cos_phi1 * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+            distances[i] = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+        return distances
+else:
+    _haversine_batch = _haversine_numpy
+
+def warm_up():
+    """Compile the distance kernel, or load it from numba's disk cache, before the first query needs it"""
+    _haversine_batch(0.0, 0.0, np.zeros(1), np.zeros(1))
+
+def symptom_mask(symptoms):
+    """Pack a dict of reported symptoms into a 5-bit mask"""
+    mask = 0
+    for bit, symptom in enumerate(SYMPTOM_ORDER):
+        if symptoms.get(symptom):
+            mask |= 1 << bit
+    return mask
+
+def severity_category(mask):
+    """Severity category ('Low', 'Moderate' or 'High') for a symptom mask"""
+    return str(CATEGORY_TABLE[mask])
+
+def report_mask(report_data):
+    """Symptom mask of a report, sent either packed as symptom_mask or as a dict of flags"""
+    if 'symptom_mask' in report_data:
+        return int(report_data['symptom_mask']) & ((1 << len(SYMPTOM_ORDER)) - 1)
+    return symptom_mask(report_data.get('symptoms', {}))
+
 class SymptomDataCollector:
-    def __init__(self, data_file='symptom_reports.csv'):
+    def __init__(self, db_file='symptom_reports.sqlite3', data_file='symptom_reports.csv'):
         """Initialize the data collector"""
-        self.data_file = data_file
+        self.db_file = db_file
+        self.data_file = data_file  # CSV export used for downstream training
         self.headers = [
             'report_id', 'timestamp', 'user_id', 'latitude', 'longitude',
             'wheezing', 'shortness_of_breath', 'chest_tightness', 'coughing',
             'difficulty_sleeping', 'severity', 'verified'
         ]
-        self._initialize_file()
+        # Report IDs are derived from the client's per-report idempotency key, so only a
+        # resent report (e.g. a retry after a gateway error) hits an existing row and is ignored
+        self._insert_sql = (
+            f"INSERT OR IGNORE INTO reports ({', '.join(self.headers)}) "
+            f"VALUES ({', '.join('?' * len(self.headers))})"
+        )
+        self._initialize_db()
+        self._write_lock = threading.Lock()
+        self._writer = self._open_writer()
     
-    def _initialize_file(self):
-        """Create the data file with headers if it doesn't exist"""
-        if not os.path.exists(self.data_file):
-            with open(self.data_file, 'w', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow(self.headers)
+    def _connect(self):
+        """Open a connection to the reports database"""
+        conn = sqlite3.connect(self.db_file)
+        conn.row_factory = sqlite3.Row
+        # Serve reads from the OS page cache instead of copying into SQLite's buffers
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        return conn
     
-    def save_report(self, report_data):
-        """Save a symptom report to the data file"""
+    def _open_writer(self):
+        """Open the long-lived connection shared by all report writes"""
+        conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        # WAL with synchronous=NORMAL fsyncs at checkpoints instead of on every commit
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        atexit.register(conn.close)
+        return conn
+    
+    def _initialize_db(self):
+        """Create the reports table and its indices if they don't exist"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS reports (
+                    report_id TEXT PRIMARY KEY,
+                    timestamp TEXT NOT NULL,
+                    user_id TEXT,
+                    latitude REAL,
+                    longitude REAL,
+                    wheezing INTEGER NOT NULL DEFAULT 0,
+                    shortness_of_breath INTEGER NOT NULL DEFAULT 0,
+                    chest_tightness INTEGER NOT NULL DEFAULT 0,
+                    coughing INTEGER NOT NULL DEFAULT 0,
+                    difficulty_sleeping INTEGER NOT NULL DEFAULT 0,
+                    severity TEXT,
+                    verified INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS reports_timestamp_idx ON reports (timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS reports_location_idx ON reports (latitude, longitude)")
+            self.has_rtree = self._create_rtree(conn)
+            
+            # Import reports collected before the move to SQLite
+            is_empty = conn.execute("SELECT 1 FROM reports LIMIT 1").fetchone() is None
+            if is_empty and os.path.exists(self.data_file):
+                self._import_csv(conn)
+    
+    def _create_rtree(self, conn):
+        """Create an R*Tree over report coordinates kept in sync by triggers; False if SQLite lacks rtree"""
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reports_rtree'"
+        ).fetchone() is not None
         try:
-            # Generate report ID
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS reports_rtree "
+                         "USING rtree(id, min_lat, max_lat, min_lon, max_lon)")
+        except sqlite3.OperationalError:
+            return False
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS reports_rtree_insert AFTER INSERT ON reports
+            WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL
+            BEGIN
+                INSERT INTO reports_rtree VALUES (new.rowid, new.latitude, new.latitude, new.longitude, new.longitude);
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS reports_rtree_delete AFTER DELETE ON reports
+            BEGIN
+                DELETE FROM reports_rtree WHERE id = old.rowid;
+            END
+        """)
+        if not exists:
+            # Index reports stored before the R*Tree was introduced
+            conn.execute("INSERT INTO reports_rtree "
+                         "SELECT rowid, latitude, latitude, longitude, longitude FROM reports "
+                         "WHERE latitude IS NOT NULL AND longitude IS NOT NULL")
+        return True
+    
+    def _import_csv(self, conn):
+        """Load rows from a legacy CSV report file into the reports table"""
+        flags = {'wheezing', 'shortness_of_breath', 'chest_tightness',
+                 'coughing', 'difficulty_sleeping', 'verified'}
+        with open(self.data_file, 'r', newline='') as file:
+            rows = [
+                [row[col] in ('True', '1') if col in flags else (row[col] or None) for col in self.headers]
+                for row in csv.DictReader(file)
+            ]
+        conn.executemany(
+            f"INSERT OR IGNORE INTO reports ({', '.join(self.headers)}) "
+            f"VALUES ({', '.join('?' * len(self.headers))})",
+            rows
+        )
+    
+    def _build_row(self, report_data):
+        """Convert a report payload into a reports table row"""
+        # Clients may send epoch nanoseconds instead of an ISO string
+        if 'timestamp_ns' in report_data:
+            seconds, nanos = divmod(int(report_data['timestamp_ns']), 1_000_000_000)
+            timestamp = datetime.fromtimestamp(seconds).replace(microsecond=nanos // 1000).isoformat()
+        else:
             timestamp = report_data.get('timestamp', datetime.now().isoformat())
-            user_id = report_data.get('user_id', 'anonymous')
-            report_id = f"rep_{hash(timestamp + user_id) % 1000000}"
-            
-            # Extract location data
-            location = report_data.get('location', {})
-            latitude = location.get('latitude', '')
-            longitude = location.get('longitude', '')
-            
-            # Extract symptoms
-            symptoms = report_data.get('symptoms', {})
-            wheezing = symptoms.get('wheezing', False)
-            shortness_of_breath = symptoms.get('shortness_of_breath', False)
-            chest_tightness = symptoms.get('chest_tightness', False)
-            coughing = symptoms.get('coughing', False)
-            difficulty_sleeping = symptoms.get('difficulty_sleeping', False)
+        user_id = report_data.get('user_id', 'anonymous')
+        # A report without an idempotency key gets a random one, so it can never collide
+        report_key = report_data.get('report_key') or uuid.uuid4().hex
+        # Stable across processes, unlike hash(), and 128 bits wide to avoid collisions
+        report_id = "rep_" + hashlib.blake2b((user_id + report_key).encode(), digest_size=16).hexdigest()
+        
+        # Extract location data
+        location = report_data.get('location', {})
+        latitude = location.get('latitude')
+        longitude = location.get('longitude')
+        
+        # Extract symptoms
+        mask = report_mask(report_data)
+        flags = [bool(mask >> bit & 1) for bit in range(len(SYMPTOM_ORDER))]
+        
+        # Look up severity
+        severity = severity_category(mask)
+        
+        return [
+            report_id, timestamp, user_id, latitude, longitude,
+            *flags, severity, False  # verified = False initially
+        ]
+    
+    def save_report(self, report_data):
+        """Save a symptom report to the reports database"""
+        try:
+            row = self._build_row(report_data)
             
-            # Calculate severity
-            severity = self._calculate_severity(symptoms)
+            # Insert into the reports table
+            with self._write_lock, self._writer as conn:
+                conn.execute(self._insert_sql, row)
             
-            # Prepare row data
-            row = [
-                report_id, timestamp, user_id, latitude, longitude,
-                wheezing, shortness_of_breath, chest_tightness, coughing,
-                difficulty_sleeping, severity, False  # verified = False initially
-            ]
+            return row[0]
+        except Exception as e:
+            raise Exception(f"Failed to save report: {str(e)}")
+    
+    def save_reports(self, reports):
+        """Save a burst of symptom reports in one transaction"""
+        try:
+            rows = [self._build_row(report_data) for report_data in reports]
             
-            # Append to CSV file
-            with open(self.data_file, 'a', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow(row)
+            with self._write_lock, self._writer as conn:
+                conn.executemany(self._insert_sql, rows)
             
-            return report_id
+            return [row[0] for row in rows]
         except Exception as e:
-            raise Exception(f"Failed to save report: {str(e)}")
+            raise Exception(f"Failed to save reports: {str(e)}")
     
     def _calculate_severity(self, symptoms):
         """Calculate severity based on reported symptoms"""
-        severity_score = 0
-        severity_map = {
-            'wheezing': 3,
-            'shortness_of_breath': 3,
-            'chest_tightness': 2,
-            'coughing': 2,
-            'difficulty_sleeping': 1
-        }
-        
-        for symptom, present in symptoms.items():
-            if present and symptom in severity_map:
-                severity_score += severity_map[symptom]
-        
-        if severity_score >= 5:
-            return 'High'
-        elif severity_score >= 3:
-            return 'Moderate'
+        return severity_category(symptom_mask(symptoms))
+    
+    def _read_reports(self, query, params=(), chunksize=100_000):
+        """Yield report chunks as DataFrames parsed by pandas"""
+        with closing(self._connect()) as conn:
+            conn.row_factory = None  # pandas expects plain tuples
+            yield from pd.read_sql_query(
+                query, conn, params=params, chunksize=chunksize, parse_dates=['timestamp']
+            )
+    
+    @staticmethod
+    def _to_records(df):
+        """Convert a reports DataFrame to JSON-friendly dicts"""
+        return df.astype(object).where(df.notna(), None).to_dict('records')
+    
+    def _reports_near(self, latitude, longitude, radius_km, limit):
+        """DataFrame of reports within radius_km of a location, most recent first, or None"""
+        dlat = radius_km / KM_PER_DEGREE
+        dlon = radius_km / (KM_PER_DEGREE * max(np.cos(np.radians(latitude)), 1e-6))
+        if self.has_rtree:
+            # Bounding box prefilter served by the R*Tree on both axes at once
+            query = ("SELECT reports.* FROM reports "
+                     "JOIN reports_rtree ON reports.rowid = reports_rtree.id "
+                     "WHERE max_lat >= ? AND min_lat <= ? AND max_lon >= ? AND min_lon <= ? "
+                     "ORDER BY timestamp DESC")
         else:
-            return 'Low'
+            # Bounding box prefilter served by the (latitude, longitude) index
+            query = ("SELECT * FROM reports "
+                     "WHERE latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ? "
+                     "ORDER BY timestamp DESC")
+        params = (latitude - dlat, latitude + dlat, longitude - dlon, longitude + dlon)
+        
+        # Exact haversine distance only for the candidates inside the box
+        matches = []
+        found = 0
+        for chunk in self._read_reports(query, params):
+            distance = _haversine_batch(float(latitude), float(longitude),
+                                        chunk['latitude'].to_numpy(dtype=np.float64),
+                                        chunk['longitude'].to_numpy(dtype=np.float64))
+            matches.append(chunk[distance <= radius_km])
+            found += len(matches[-1])
+            # Rows arrive newest first, so later chunks can't displace these
+            if limit is not None and found >= limit:
+                break
+        if not matches:
+            return None
+        df = pd.concat(matches)
+        return df if limit is None else df.head(limit)
+    
+    def get_reports_by_location(self, latitude, longitude, radius_km=10, limit=None):
+        """Get reports within a certain radius of a location, most recent first"""
+        try:
+            df = self._reports_near(latitude, longitude, radius_km, limit)
+            return [] if df is None else self._to_records(df)
+        except Exception as e:
+            raise Exception(f"Failed to retrieve reports: {str(e)}")
     
-    def get_reports_by_location(self, latitude, longitude, radius_km=10):
-        """Get reports within a certain radius of a location"""
-        # This is a simplified implementation
-        # In a real system, you would use proper geospatial queries
-        reports = []
+    def get_severity_counts_by_location(self, latitude, longitude, radius_km=10, limit=None):
+        """Count the most recent reports near a location per severity category"""
         try:
-            with open(self.data_file, 'r') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    # Simple distance calculation (not accurate for large distances)
-                    try:
-                        rep_lat = float(row.get('latitude', 0))
-                        rep_lon = float(row.get('longitude', 0))
-                        distance = ((rep_lat - latitude) ** 2 + (rep_lon - longitude) ** 2) ** 0.5
-                        
-                        if distance <= radius_km/100:  # Very rough approximation
-                            reports.append(row)
-                    except (ValueError, TypeError):
-                        continue
-            return reports
+            df = self._reports_near(latitude, longitude, radius_km, limit)
+            if df is None:
+                counts = np.zeros(len(SEVERITY_CATEGORIES), dtype=np.int64)
+            else:
+                # One histogram over small integer codes instead of a loop over rows
+                codes = pd.Categorical(df['severity'], categories=SEVERITY_CATEGORIES).codes
+                counts = np.bincount(codes[codes >= 0], minlength=len(SEVERITY_CATEGORIES))
+            return dict(zip(SEVERITY_CATEGORIES, counts.tolist()))
         except Exception as e:
             raise Exception(f"Failed to retrieve reports: {str(e)}")
     
     def get_reports_by_timeframe(self, start_date, end_date):
         """Get reports within a specific timeframe"""
-        reports = []
         try:
-            with open(self.data_file, 'r') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    try:
-                        report_time = datetime.fromisoformat(row['timestamp'])
-                        if start_date <= report_time <= end_date:
-                            reports.append(row)
-                    except (ValueError, TypeError):
-                        continue
-            return reports
+            query = "SELECT * FROM reports WHERE timestamp BETWEEN ? AND ?"
+            chunks = list(self._read_reports(query, (start_date.isoformat(), end_date.isoformat())))
+            return self._to_records(pd.concat(chunks)) if chunks else []
         except Exception as e:
             raise Exception(f"Failed to retrieve reports: {str(e)}")
     
     def verify_report(self, report_id):
         """Mark a report as verified"""
         try:
-            # Read all data
-            rows = []
-            with open(self.data_file, 'r') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    if row['report_id'] == report_id:
-                        row['verified'] = 'True'
-                    rows.append(row)
-            
-            # Write updated data
-            with open(self.data_file, 'w', newline='') as file:
-                writer = csv.DictWriter(file, fieldnames=self.headers)
-                writer.writeheader()
-                writer.writerows(rows)
-                
-            return True
+            with self._write_lock, self._writer as conn:
+                # Already-verified rows are skipped so repeat calls don't dirty a page
+                updated = conn.execute(
+                    "UPDATE reports SET verified = 1 WHERE report_id = ? AND verified = 0", (report_id,)
+                ).rowcount
+                if updated:
+                    return True
+                return conn.execute("SELECT 1 FROM reports WHERE report_id = ?", (report_id,)).fetchone() is not None
         except Exception as e:
             raise Exception(f"Failed to verify report: {str(e)}")
+    
+    def export_csv(self, filepath=None):
+        """Export all reports to CSV for downstream model training"""
+        filepath = filepath or self.data_file
+        try:
+            with closing(self._connect()) as conn:
+                rows = conn.execute(f"SELECT {', '.join(self.headers)} FROM reports ORDER BY timestamp")
+                with open(filepath, 'w', newline='') as file:
+                    writer = csv.writer(file)
+                    writer.writerow(self.headers)
+                    writer.writerows(rows)
+            return filepath
+        except Exception as e:
+            raise Exception(f"Failed to export reports: {str(e)}")
+    
+    def export_parquet(self, filepath='symptom_reports.parquet'):
+        """Export all reports to zstd-compressed Parquet for analytical scans"""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            
+            writer = None
+            try:
+                for chunk in self._read_reports("SELECT * FROM reports ORDER BY timestamp"):
+                    if writer is None:
+                        schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                        writer = pq.ParquetWriter(filepath, schema, compression='zstd')
+                    writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            finally:
+                if writer is not None:
+                    writer.close()
+            return filepath
+        except Exception as e:
+            raise Exception(f"Failed to export reports: {str(e)}")
+
+# Shared instance, created on first use so importing this module doesn't open the database
+_symptom_collector = None
+_collector_lock = threading.Lock()
 
-# Global instance
-symptom_collector = SymptomDataCollector()
+def get_symptom_collector():
+    """Return the shared symptom data collector, creating it on first call"""
+    global _symptom_collector
+    with _collector_lock:
+        if _symptom_collector is None:
+            _symptom_collector = SymptomDataCollector()
+        return _symptom_collector
 
 def save_symptom_report(report_data):
     """Convenience function to save a symptom report"""
-    return symptom_collector.save_report(report_data)
+    return get_symptom_collector().save_report(report_data)
 
-def get_local_symptom_reports(latitude, longitude, radius_km=10):
+def save_symptom_reports(reports):
+    """Convenience function to save a batch of symptom reports"""
+    return get_symptom_collector().save_reports(reports)
+
+def get_local_symptom_reports(latitude, longitude, radius_km=10, limit=None):
     """Convenience function to get local symptom reports"""
-    return symptom_collector.get_reports_by_location(latitude, longitude, radius_km)
+    return get_symptom_collector().get_reports_by_location(latitude, longitude, radius_km, limit)
+
+def get_local_severity_counts(latitude, longitude, radius_km=10, limit=None):
+    """Convenience function to count local symptom reports per severity"""
+    return get_symptom_collector().get_severity_counts_by_location(latitude, longitude, radius_km, limit)
 
 def get_timeframe_symptom_reports(start_date, end_date):
     """Convenience function to get symptom reports in a timeframe"""
-    return symptom_collector.get_reports_by_timeframe(start_date, end_date)
\ No newline at end of file
+    return get_symptom_collector().get_reports_by_timeframe(start_date, end_date)
+
+def export_symptom_reports_csv(filepath=None):
+    """Convenience function to export symptom reports to CSV"""
+    return get_symptom_collector().export_csv(filepath)
+
+def export_symptom_reports_parquet(filepath='symptom_reports.parquet'):
+    """Convenience function to export symptom reports to Parquet"""
+    return get_symptom_collector().export_parquet(filepath)
+
+def load_symptom_reports_parquet(filepath='symptom_reports.parquet', columns=None):
+    """Load exported symptom reports, reading only the requested columns"""
+    return pd.read_parquet(filepath, columns=columns)
\ No newline at end of file
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Prediction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(db_index=True, max_length=100)),
+                ('timestamp', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('pm25', models.FloatField()),
+                ('pm10', models.FloatField()),
+                ('temperature', models.FloatField()),
+                ('humidity', models.FloatField()),
+                ('asthma_risk', models.CharField(max_length=20)),
+                ('advice', models.TextField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asthmashield_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='prediction',
+            name='city',
+            field=models.CharField(max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['asthma_risk', '-timestamp'], name='pred_risk_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['city'], name='pred_city_idx'),
+        ),
+    ]
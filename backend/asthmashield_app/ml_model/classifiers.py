@@ -0,0 +1,11 @@
+"""
+Classifier families shared by training and the XAI explainer; kept free of imports
+so train_model.py can use them without loading the inference stack
+"""
+
+# Classifier families with a specialized (non-Kernel) SHAP explainer
+TREE_CLASSIFIERS = {
+    'RandomForestClassifier', 'GradientBoostingClassifier', 'HistGradientBoostingClassifier',
+    'ExtraTreesClassifier'
+}
+LINEAR_CLASSIFIERS = {'LogisticRegression', 'SGDClassifier', 'LinearSVC'}
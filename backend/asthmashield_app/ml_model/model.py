@@ -5,64 +5,195 @@ ML model for asthma risk prediction with enhanced accuracy
 import numpy as np
 import joblib
 import os
+import functools
+import threading
+from dataclasses import dataclass
 
-def load_model(model_type='best'):
-    """Load the trained model and related components"""
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+try:
+    from cuml.fil import ForestInference
+except ImportError:
+    ForestInference = None
+
+# Serializes cache misses so concurrent requests don't unpickle the same model twice
+_load_lock = threading.Lock()
+
+def _resolve_model_path(model_type):
+    """Return the pkl path for a model type, falling back to the default model"""
+    model_dir = os.path.dirname(__file__)
+    
+    # Try to load specific model type first
+    model_filename = f'{model_type.lower().replace(" ", "_")}_model.pkl'
+    model_path = os.path.join(model_dir, model_filename)
+    
+    # If specific model doesn't exist, try to load the best model
+    if not os.path.exists(model_path):
+        model_path = os.path.join(model_dir, 'random_forest_model.pkl')
+    
+    return model_path
+
+@dataclass(frozen=True)
+class ModelBundle:
+    """Loaded model components with class labels and feature names frozen as tuples"""
+    model: object
+    label_encoder: object
+    feature_columns: tuple
+    classes: tuple
+    labels: np.ndarray
+
+@functools.lru_cache(maxsize=8)
+def _load_model_cached(model_path, model_mtime):
+    """Deserialize model components; keyed on mtime so retrained models are reloaded"""
+    model_dir = os.path.dirname(model_path)
+    encoder_path = os.path.join(model_dir, 'label_encoder.pkl')
+    feature_path = os.path.join(model_dir, 'feature_columns.pkl')
+    
+    model = joblib.load(model_path)
+    label_encoder = joblib.load(encoder_path)
+    feature_columns = joblib.load(feature_path)
+    
+    # Either a fitted LabelEncoder or a plain list of class names in code order
+    classes = tuple(map(str, getattr(label_encoder, 'classes_', label_encoder)))
+    
+    return ModelBundle(
+        model=model,
+        label_encoder=label_encoder,
+        feature_columns=tuple(feature_columns),
+        classes=classes,
+        labels=np.array(classes, dtype=object)
+    )
+
+def load_model_bundle(model_type='best'):
+    """Load the trained model and related components as a ModelBundle"""
     try:
-        model_dir = os.path.dirname(__file__)
-        
-        # Try to load specific model type first
-        model_filename = f'{model_type.lower().replace(" ", "_")}_model.pkl'
-        model_path = os.path.join(model_dir, model_filename)
-        
-        # If specific model doesn't exist, try to load the best model
-        if not os.path.exists(model_path):
-            model_path = os.path.join(model_dir, 'random_forest_model.pkl')
-        
-        encoder_path = os.path.join(model_dir, 'label_encoder.pkl')
-        feature_path = os.path.join(model_dir, 'feature_columns.pkl')
+        model_path = _resolve_model_path(model_type)
+        model_mtime = os.path.getmtime(model_path)
         
-        model = joblib.load(model_path)
-        label_encoder = joblib.load(encoder_path)
-        feature_columns = joblib.load(feature_path)
-        
-        return model, label_encoder, feature_columns
+        with _load_lock:
+            return _load_model_cached(model_path, model_mtime)
     except FileNotFoundError as e:
         raise FileNotFoundError(f"Model files not found. Please train the model first using train_model.py. Error: {e}")
 
+def load_model(model_type='best'):
+    """Load the trained model and related components"""
+    bundle = load_model_bundle(model_type)
+    return bundle.model, bundle.label_encoder, bundle.feature_columns
+
+@functools.lru_cache(maxsize=8)
+def _load_onnx_session(onnx_path, onnx_mtime):
+    """Create an ONNX Runtime session; keyed on mtime like the pickle cache"""
+    return ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider'])
+
+def load_onnx_session(model_type='best'):
+    """Return an ONNX Runtime session for the model, or None if no current export exists"""
+    if ort is None:
+        return None
+    
+    model_path = _resolve_model_path(model_type)
+    onnx_path = os.path.splitext(model_path)[0] + '.onnx'
+    
+    # Ignore exports older than the pickle so a retrain without skl2onnx isn't shadowed
+    if not os.path.exists(onnx_path) or os.path.getmtime(onnx_path) < os.path.getmtime(model_path):
+        return None
+    
+    with _load_lock:
+        return _load_onnx_session(onnx_path, os.path.getmtime(onnx_path))
+
+@functools.lru_cache(maxsize=8)
+def _load_fil_model(model_path, model_mtime):
+    """Convert a random forest to a GPU Forest Inference model; returns (fil, scaler) or None"""
+    model = _load_model_cached(model_path, model_mtime).model
+    steps = getattr(model, 'named_steps', {})
+    classifier = steps.get('classifier', model)
+    if type(classifier).__name__ != 'RandomForestClassifier':
+        return None
+    
+    try:
+        fil = ForestInference.load_from_sklearn(classifier, output_class=True)
+        # Tune the memory layout for the single-row requests the API sends
+        if hasattr(fil, 'optimize'):
+            fil.optimize(batch_size=1)
+    except Exception as e:
+        # No usable CUDA device; serve from ONNX Runtime or sklearn instead
+        print(f"Forest Inference unavailable, using the CPU model: {e}")
+        return None
+    return fil, steps.get('scaler')
+
+def load_fil_model(model_type='best'):
+    """Return a (ForestInference, scaler) pair for the model, or None if cuML can't serve it"""
+    if ForestInference is None:
+        return None
+    
+    model_path = _resolve_model_path(model_type)
+    with _load_lock:
+        return _load_fil_model(model_path, os.path.getmtime(model_path))
+
+def predict_asthma_risk_batch(features, model_type='best'):
+    """
+    Predict asthma risk for many feature rows in a single model call
+    
+    Args:
+        features (array-like): Shape (n_samples, 10) in training feature order
+        model_type (str): Model to use for prediction
+    
+    Returns:
+        dict: Arrays of risk levels, confidences and class probabilities
+    """
+    bundle = load_model_bundle(model_type)
+    model = bundle.model
+    
+    features = np.ascontiguousarray(np.atleast_2d(features), dtype=np.float32)
+    
+    fil_model = load_fil_model(model_type)
+    session = load_onnx_session(model_type) if fil_model is None else None
+    if fil_model is not None:
+        fil, scaler = fil_model
+        if scaler is not None:
+            features = scaler.transform(features).astype(np.float32)
+        probabilities = np.asarray(fil.predict_proba(features))
+        # Classes are label-encoded 0..k-1, so the argmax column is the encoded prediction
+        predictions_encoded = probabilities.argmax(axis=1)
+    elif session is not None:
+        predictions_encoded, probabilities = session.run(['label', 'probabilities'], {'input': features})
+    else:
+        # One predict/predict_proba call amortizes sklearn's per-call overhead over the batch
+        predictions_encoded = model.predict(features)
+        
+        probabilities = None
+        if hasattr(model, "predict_proba"):
+            probabilities = model.predict_proba(features)
+    
+    return {
+        'risk_levels': bundle.labels[np.asarray(predictions_encoded, dtype=np.intp)],
+        'confidences': probabilities.max(axis=1) if probabilities is not None else None,
+        'probabilities': probabilities,
+        'classes': bundle.classes
+    }
+
 def predict_asthma_risk(pm25, pm10, temperature, humidity, pollen_level, 
                        wind_speed, pressure, patient_age, 
                        patient_history_severe_attacks, medication_adherence,
                        model_type='best', include_xai=False):
     """Predict asthma risk level with enhanced accuracy"""
     try:
-        model, label_encoder, feature_columns = load_model(model_type)
-        
         # Prepare features in the correct order
-        features = np.array([[
+        features = np.array([
             pm25, pm10, temperature, humidity, pollen_level, 
             wind_speed, pressure, patient_age, 
             patient_history_severe_attacks, medication_adherence
-        ]])
-        
-        # Make prediction
-        prediction_encoded = model.predict(features)[0]
-        
-        # Get prediction probabilities if available
-        probabilities = None
-        if hasattr(model, "predict_proba"):
-            probabilities = model.predict_proba(features)[0]
-        
-        # Decode prediction
-        prediction = label_encoder.inverse_transform([prediction_encoded])[0]
+        ])
         
-        # Create confidence score
-        confidence = max(probabilities) if probabilities is not None else None
+        batch = predict_asthma_risk_batch(features[None, :], model_type)
+        probabilities = batch['probabilities'][0] if batch['probabilities'] is not None else None
         
         result = {
-            'risk_level': prediction,
-            'confidence': confidence,
-            'probabilities': dict(zip(label_encoder.classes_, probabilities)) if probabilities is not None else None
+            'risk_level': str(batch['risk_levels'][0]),
+            'confidence': float(batch['confidences'][0]) if probabilities is not None else None,
+            'probabilities': {c: float(p) for c, p in zip(batch['classes'], probabilities)} if probabilities is not None else None
         }
         
         # Add XAI explanations if requested
@@ -83,23 +214,31 @@ def predict_asthma_risk(pm25, pm10, temperature, humidity, pollen_level,
     except Exception as e:
         raise Exception(f"Error during prediction: {str(e)}")
 
+@functools.lru_cache(maxsize=8)
+def _feature_importance_cached(model_path, model_mtime):
+    """Feature importances for a model file; keyed on mtime like the model cache"""
+    bundle = _load_model_cached(model_path, model_mtime)
+    classifier = bundle.model.named_steps['classifier']
+    
+    # Check if model has feature importance
+    if not hasattr(classifier, 'feature_importances_'):
+        return None
+    return dict(zip(bundle.feature_columns, map(float, classifier.feature_importances_)))
+
 def get_feature_importance(model_type='best'):
     """Get feature importance from the trained model (if available)"""
     try:
-        model, label_encoder, feature_columns = load_model(model_type)
-        
-        # Check if model has feature importance
-        if hasattr(model.named_steps['classifier'], 'feature_importances_'):
-            importances = model.named_steps['classifier'].feature_importances_
-            feature_importance = dict(zip(feature_columns, importances))
-            return feature_importance
-        else:
-            return None
+        # Load under the lock first so the bundle lookup inside the cache is a hit
+        load_model_bundle(model_type)
+        model_path = _resolve_model_path(model_type)
+        feature_importance = _feature_importance_cached(model_path, os.path.getmtime(model_path))
+        # Copy so callers can't mutate the cached mapping
+        return dict(feature_importance) if feature_importance is not None else None
     except Exception as e:
         return None
 
-# For testing purposes
-if __name__ == "__main__":
+def main():
+    """Run a sample prediction against the trained model"""
     # This will only work if the model has been trained
     try:
         result = predict_asthma_risk(
@@ -123,4 +262,8 @@ if __name__ == "__main__":
     except FileNotFoundError as e:
         print(f"Error: {e}")
     except Exception as e:
-        print(f"Prediction error: {e}")
\ No newline at end of file
+        print(f"Prediction error: {e}")
+
+# For testing purposes
+if __name__ == "__main__":
+    main()
\ No newline at end of file
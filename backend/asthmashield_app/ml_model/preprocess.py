@@ -4,8 +4,13 @@ Data preprocessing for asthma risk prediction
 
 import pandas as pd
 import numpy as np
+from operator import itemgetter
 from sklearn.preprocessing import StandardScaler
 
+# Built once at import; each call does one C-level lookup per nested payload
+_main_fields = itemgetter('temp', 'humidity')
+_aqi_fields = itemgetter('pm2_5', 'pm10')
+
 def preprocess_weather_data(weather_data, aqi_data):
     """
     Preprocess weather and AQI data for model prediction
@@ -17,30 +22,21 @@ def preprocess_weather_data(weather_data, aqi_data):
     Returns:
         np.array: Preprocessed features
     """
-    # Extract weather features
-    temperature = weather_data['main']['temp'] - 273.15  # Convert from Kelvin to Celsius
-    humidity = weather_data['main']['humidity']
-    pressure = weather_data['main']['pressure']
-    wind_speed = weather_data['wind']['speed']
-    
-    # Extract AQI features
-    pm25 = aqi_data['list'][0]['components']['pm2_5']
-    pm10 = aqi_data['list'][0]['components']['pm10']
-    no2 = aqi_data['list'][0]['components']['no2']
-    o3 = aqi_data['list'][0]['components']['o3']
+    temp_kelvin, humidity = _main_fields(weather_data['main'])
+    pm25, pm10 = _aqi_fields(aqi_data['list'][0]['components'])
     
     # For now, we'll use a simple approach without pollen data
     # In a real implementation, you might get pollen data from another API
     pollen = 50  # Placeholder value
     
-    # Create feature array
+    # Create feature array (temperature converted from Kelvin to Celsius inline)
     features = np.array([
         pm25,
         pm10,
-        temperature,
+        temp_kelvin - 273.15,
         humidity,
         pollen
-    ])
+    ], dtype=np.float32)
     
     return features
 
@@ -57,8 +53,8 @@ def normalize_features(features, scaler=None):
     """
     if scaler is None:
         scaler = StandardScaler()
-        normalized_features = scaler.fit_transform(features.reshape(1, -1))
+        normalized_features = scaler.fit_transform(features[None, :])
     else:
-        normalized_features = scaler.transform(features.reshape(1, -1))
+        normalized_features = scaler.transform(features[None, :])
     
     return normalized_features, scaler
\ No newline at end of file
@@ -4,42 +4,105 @@ Provides SHAP and LIME explanations for model predictions
 """
 
 import numpy as np
-import pandas as pd
-import shap
-import lime
-import lime.lime_tabular
 import os
-import joblib
-from .model import load_model
+import heapq
+import functools
+import threading
+from .model import load_model, load_model_bundle
+from .classifiers import TREE_CLASSIFIERS, LINEAR_CLASSIFIERS
+
+# Sampling budgets per explained row: KernelExplainer coalitions and LIME perturbations
+# (LIME defaults to 5000, which is far more than ten features need)
+KERNEL_NSAMPLES = 100
+LIME_NUM_SAMPLES = 1000
+
+# Stratified sample of unscaled training rows written by train_model.py
+BACKGROUND_PATH = os.path.join(os.path.dirname(__file__), 'xai_background.npz')
+
+@functools.lru_cache(maxsize=None)
+def _import_shap():
+    """Import shap on first use; it pulls in numba/matplotlib, so plain predictions skip it"""
+    import shap
+    return shap
+
+@functools.lru_cache(maxsize=None)
+def _import_lime_tabular():
+    """Import lime.lime_tabular on first use"""
+    import lime.lime_tabular
+    return lime.lime_tabular
+
+def top_k_by_abs(weights, k=5):
+    """The k (feature, weight) pairs with the largest absolute weight, largest first"""
+    return heapq.nlargest(k, weights.items(), key=lambda item: abs(item[1]))
+
+def load_background(path=BACKGROUND_PATH):
+    """Load the persisted XAI background sample, or None if it hasn't been generated"""
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return data['X']
 
 class XAIExplainer:
     def __init__(self, model_type='best'):
         """Initialize the XAI explainer with a trained model"""
-        self.model, self.label_encoder, self.feature_columns = load_model(model_type)
+        bundle = load_model_bundle(model_type)
+        self.model, self.label_encoder, self.feature_columns = bundle.model, bundle.label_encoder, bundle.feature_columns
+        self.classes = bundle.classes
         self.model_type = model_type
         self.explainer_shap = None
         self.explainer_lime = None
+        self._background = load_background()
+        
+        # Inline the pipeline's StandardScaler so explanations skip sklearn's per-call overhead
+        self.classifier = self.model.named_steps['classifier']
+        scaler = self.model.named_steps.get('scaler')
+        n_features = len(self.feature_columns)
+        self._mean = scaler.mean_.astype(np.float32) if scaler is not None else np.zeros(n_features, np.float32)
+        self._scale = scaler.scale_.astype(np.float32) if scaler is not None else np.ones(n_features, np.float32)
+        
+    def _scale_features(self, x):
+        """Apply the pipeline's scaling to raw feature rows"""
+        return (np.asarray(x, dtype=np.float32) - self._mean) / self._scale
         
     def initialize_shap(self, X_sample=None):
         """Initialize SHAP explainer"""
         try:
-            # For tree-based models, use TreeExplainer
-            if hasattr(self.model.named_steps['classifier'], 'feature_importances_'):
-                self.explainer_shap = shap.TreeExplainer(self.model.named_steps['classifier'])
+            shap = _import_shap()
+            classifier = self.classifier
+            classifier_name = type(classifier).__name__
+            
+            # Pick the fastest exact explainer for the deployed model family
+            if classifier_name in TREE_CLASSIFIERS:
+                # Tree path dependent SHAP needs no background data
+                self.explainer_shap = shap.TreeExplainer(
+                    classifier, feature_perturbation='tree_path_dependent'
+                )
+                return True
+            
+            if X_sample is not None:
+                background_data = np.asarray(X_sample)
+            elif self._background is not None:
+                # The classifier sees scaled inputs, so scale the raw training sample
+                background_data = self._scale_features(self._background)
             else:
-                # For other models, use KernelExplainer with a sample of data
-                if X_sample is not None:
-                    self.explainer_shap = shap.KernelExplainer(
-                        self.model.named_steps['classifier'].predict_proba, 
-                        X_sample
-                    )
-                else:
-                    # Create a small background dataset
-                    background_data = np.random.rand(10, len(self.feature_columns))
-                    self.explainer_shap = shap.KernelExplainer(
-                        self.model.named_steps['classifier'].predict_proba, 
-                        background_data
-                    )
+                # Create a small background dataset
+                background_data = np.random.rand(10, len(self.feature_columns))
+            
+            if classifier_name in LINEAR_CLASSIFIERS:
+                self.explainer_shap = shap.LinearExplainer(
+                    classifier, background_data, feature_perturbation='interventional'
+                )
+            elif classifier_name == 'SVC':
+                # Summarize the background so KernelExplainer evaluates the SVM far fewer times
+                self.explainer_shap = shap.KernelExplainer(
+                    classifier.predict_proba,
+                    shap.kmeans(background_data, min(10, len(background_data)))
+                )
+            else:
+                self.explainer_shap = shap.KernelExplainer(
+                    classifier.predict_proba,
+                    shap.sample(background_data, min(50, len(background_data)))
+                )
             return True
         except Exception as e:
             print(f"Error initializing SHAP explainer: {e}")
@@ -51,12 +114,19 @@ class XAIExplainer:
             # Convert feature columns to list if needed
             feature_names = list(self.feature_columns) if hasattr(self.feature_columns, '__iter__') else self.feature_columns
             
+            if training_data is None:
+                training_data = self._background
+            if training_data is None:
+                training_data = np.random.rand(100, len(feature_names))
+            
             # Create LIME explainer
-            self.explainer_lime = lime.lime_tabular.LimeTabularExplainer(
-                training_data=training_data if training_data is not None else np.random.rand(100, len(feature_names)),
+            lime_tabular = _import_lime_tabular()
+            self.explainer_lime = lime_tabular.LimeTabularExplainer(
+                training_data=training_data,
                 feature_names=feature_names,
-                class_names=self.label_encoder.classes_,
-                mode='classification'
+                class_names=list(self.classes),
+                mode='classification',
+                discretize_continuous=False
             )
             return True
         except Exception as e:
@@ -65,77 +135,113 @@ class XAIExplainer:
     
     def explain_shap(self, features):
         """Generate SHAP explanation for a prediction"""
+        return self.explain_shap_batch([features])[0]
+    
+    def explain_shap_batch(self, samples):
+        """Generate SHAP explanations for many rows with one explainer call"""
+        samples = np.atleast_2d(np.asarray(samples, dtype=np.float32))
         try:
             if self.explainer_shap is None:
                 self.initialize_shap()
                 
             # Apply preprocessing pipeline
-            features_processed = self.model.named_steps['scaler'].transform([features])
+            features_processed = self._scale_features(samples)
             
-            # Calculate SHAP values
-            shap_values = self.explainer_shap.shap_values(features_processed)
+            # Calculate SHAP values for the whole batch; KernelExplainer's sampling budget is capped
+            if type(self.explainer_shap).__name__ == 'KernelExplainer':
+                shap_values = self.explainer_shap.shap_values(features_processed, nsamples=KERNEL_NSAMPLES)
+            else:
+                shap_values = self.explainer_shap.shap_values(features_processed)
             
-            # Handle different SHAP output formats
+            # Handle different SHAP output formats: a list per class, (rows, features, classes), or (rows, features)
             if isinstance(shap_values, list):
-                # For multi-class, return explanation for predicted class
-                prediction = self.model.predict([features])[0]
-                class_idx = prediction  # Already encoded
-                shap_vals = shap_values[class_idx]
-            else:
-                shap_vals = shap_values
-                
-            # Create feature importance dictionary
-            feature_importance = dict(zip(self.feature_columns, shap_vals[0]))
+                shap_values = np.stack(shap_values, axis=-1)
+            shap_values = np.asarray(shap_values)
+            if shap_values.ndim == 3:
+                # For multi-class, return explanation for each row's predicted class
+                predictions = self.model.predict(samples)  # Already encoded
+                shap_values = shap_values[np.arange(len(samples)), :, predictions]
             
-            return {
-                'explanation_method': 'SHAP',
-                'feature_importance': feature_importance,
-                'shap_values': shap_vals[0].tolist() if hasattr(shap_vals[0], 'tolist') else shap_vals[0]
-            }
+            return [
+                {
+                    'explanation_method': 'SHAP',
+                    'feature_importance': {f: float(v) for f, v in zip(self.feature_columns, row)},
+                    'shap_values': row.tolist()
+                }
+                for row in shap_values
+            ]
         except Exception as e:
-            return {
+            return [{
                 'error': f"SHAP explanation failed: {str(e)}",
                 'explanation_method': 'SHAP'
-            }
+            }] * len(samples)
     
     def explain_lime(self, features, num_features=10):
         """Generate LIME explanation for a prediction"""
+        return self.explain_lime_batch([features], num_features)[0]
+    
+    def explain_lime_batch(self, samples, num_features=10, num_samples=LIME_NUM_SAMPLES):
+        """Generate LIME explanations for many rows, reusing one explainer and one predict call"""
+        samples = np.atleast_2d(np.asarray(samples, dtype=np.float32))
         try:
             if self.explainer_lime is None:
                 self.initialize_lime()
                 
-            def predict_fn(x):
-                # Apply same preprocessing as training
-                x_scaled = self.model.named_steps['scaler'].transform(x)
-                return self.model.named_steps['classifier'].predict_proba(x_scaled)
-            
-            # Generate LIME explanation
-            exp = self.explainer_lime.explain_instance(
-                features, 
-                predict_fn, 
-                num_features=num_features,
-                top_labels=1
-            )
-            
-            # Get explanation for the top predicted class
-            prediction = self.model.predict([features])[0]
-            class_label = self.label_encoder.inverse_transform([prediction])[0]
+            # Apply same preprocessing as training
+            predict_fn = lambda x: self.classifier.predict_proba(self._scale_features(x))
             
-            # Extract feature weights
-            explanation = exp.as_list(label=prediction)
-            feature_weights = dict(explanation)
-            
-            return {
-                'explanation_method': 'LIME',
-                'predicted_class': class_label,
-                'feature_weights': feature_weights,
-                'explanation': explanation
-            }
+            # Get the top predicted class of every row at once
+            predictions = self.model.predict(samples)
         except Exception as e:
-            return {
+            return [{
                 'error': f"LIME explanation failed: {str(e)}",
                 'explanation_method': 'LIME'
-            }
+            }] * len(samples)
+        
+        results = []
+        for features, prediction in zip(samples, predictions):
+            try:
+                # Generate LIME explanation
+                exp = self.explainer_lime.explain_instance(
+                    features, 
+                    predict_fn, 
+                    num_features=num_features,
+                    top_labels=1,
+                    num_samples=num_samples
+                )
+                
+                # Extract feature weights
+                explanation = exp.as_list(label=prediction)
+                
+                results.append({
+                    'explanation_method': 'LIME',
+                    'predicted_class': self.classes[prediction],
+                    'feature_weights': dict(explanation),
+                    'explanation': explanation
+                })
+            except Exception as e:
+                results.append({
+                    'error': f"LIME explanation failed: {str(e)}",
+                    'explanation_method': 'LIME'
+                })
+        return results
+
+
+# Process-wide explainers keyed by model type, built once and reused across requests
+_EXPLAINERS = {}
+_explainers_lock = threading.Lock()
+
+def get_explainer(model_type='best'):
+    """Return a warmed XAIExplainer for the model type, rebuilding it if the model was retrained"""
+    with _explainers_lock:
+        explainer = _EXPLAINERS.get(model_type)
+        model = load_model(model_type)[0]
+        if explainer is None or explainer.model is not model:
+            explainer = XAIExplainer(model_type)
+            explainer.initialize_shap()
+            explainer.initialize_lime()
+            _EXPLAINERS[model_type] = explainer
+        return explainer
 
 def get_xai_explanation(pm25, pm10, temperature, humidity, pollen_level, 
                        wind_speed, pressure, patient_age, 
@@ -150,8 +256,8 @@ def get_xai_explanation(pm25, pm10, temperature, humidity, pollen_level,
             patient_history_severe_attacks, medication_adherence
         ]
         
-        # Initialize explainer
-        explainer = XAIExplainer()
+        # Reuse the shared explainer
+        explainer = get_explainer()
         
         explanations = {}
         
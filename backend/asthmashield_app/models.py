@@ -3,7 +3,7 @@ from django.db import models
 
 class Prediction(models.Model):
     city = models.CharField(max_length=100)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
     pm25 = models.FloatField()
     pm10 = models.FloatField()
     temperature = models.FloatField()
@@ -11,5 +11,11 @@ class Prediction(models.Model):
     asthma_risk = models.CharField(max_length=20)
     advice = models.TextField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['asthma_risk', '-timestamp'], name='pred_risk_ts_idx'),
+            models.Index(fields=['city'], name='pred_city_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.city} - {self.timestamp}"
\ No newline at end of file
+        return f"{self.city} - {self.timestamp}"
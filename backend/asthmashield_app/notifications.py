@@ -4,17 +4,129 @@ Handles SMS, email, and push notifications for asthma risk alerts
 """
 
 import os
-import boto3
-from botocore.exceptions import ClientError
-from django.conf import settings
+import atexit
+import csv
+import functools
+import threading
+from string import Template
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import numpy as np
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from twilio.rest import Client
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Recycle the pooled SMTP session after this many messages to respect provider limits
+SMTP_MAX_MESSAGES = 100
+
+# Concurrent SMS deliveries in flight per fan-out batch
+SMS_BATCH_SIZE = 10
+
+# Alert body, parsed once at import rather than rebuilt as an f-string per alert
+ALERT_TEMPLATE = Template("""
+Asthma Risk Alert for $name
+
+Risk Level: $risk_level
+Location: $city
+
+Environmental Conditions:
+- PM2.5: $pm25 μg/m³
+- PM10: $pm10 μg/m³
+- Temperature: $temperature°C
+- Humidity: $humidity%
+- Pollen Level: $pollen_level
+
+Recommendations:
+1. Stay indoors during peak pollution hours
+2. Keep windows closed
+3. Use air purifier if available
+4. Take prescribed medication as scheduled
+5. Carry rescue inhaler
+
+Nearest Medical Facilities:
+$facilities
+For immediate medical assistance, call emergency services.""")
+
+# Keep enough pooled HTTPS connections for concurrent fan-out, with adaptive client-side throttling
+AWS_CLIENT_OPTIONS = {'max_pool_connections': 50, 'retries': {'mode': 'adaptive'}}
+
+EARTH_RADIUS_KM = 6371.0
+
+class FacilityIndex:
+    """Nearest-neighbour index over a local export of medical facilities"""
+    
+    def __init__(self, facilities):
+        from sklearn.neighbors import BallTree
+        
+        self.facilities = facilities
+        coords = np.array([[f['latitude'], f['longitude']] for f in facilities], dtype=np.float64)
+        self.tree = BallTree(np.radians(coords), metric='haversine')
+    
+    @classmethod
+    def from_csv(cls, path):
+        """Build an index from a CSV with name, address, latitude and longitude columns"""
+        with open(path, 'r', newline='') as file:
+            facilities = [
+                {
+                    'name': row.get('name') or 'Medical Facility',
+                    'address': row.get('address', ''),
+                    'latitude': float(row['latitude']),
+                    'longitude': float(row['longitude'])
+                }
+                for row in csv.DictReader(file)
+            ]
+        return cls(facilities) if facilities else None
+    
+    def query(self, latitude, longitude, max_results=5):
+        """Return up to max_results facilities ordered by great-circle distance"""
+        k = min(max_results, len(self.facilities))
+        distances, indices = self.tree.query(np.radians([[latitude, longitude]]), k=k)
+        return [
+            {
+                'name': self.facilities[i]['name'],
+                'address': self.facilities[i]['address'],
+                'distance': float(d * EARTH_RADIUS_KM),
+                'position': [self.facilities[i]['longitude'], self.facilities[i]['latitude']]
+            }
+            for d, i in zip(distances[0], indices[0])
+        ]
+
+@functools.lru_cache(maxsize=None)
+def _get_facility_index(path):
+    """Load the facility index once per process; None when no export is available"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return FacilityIndex.from_csv(path)
+    except Exception as e:
+        logger.error(f"Failed to load medical facility index from {path}: {e}")
+        return None
+
+@functools.lru_cache(maxsize=None)
+def _get_aws_client(service_name, access_key, secret_key, region):
+    """Build a boto3 client once per service and credential set, shared across instances"""
+    # Imported on first use so processes without AWS credentials never load boto3
+    import boto3
+    from botocore.config import Config
+    
+    return boto3.client(
+        service_name,
+        aws_access_key_id=access_key,
+        aws_secret_access_key=secret_key,
+        region_name=region,
+        config=Config(**AWS_CLIENT_OPTIONS)
+    )
+
+@functools.lru_cache(maxsize=None)
+def _get_twilio(account_sid, auth_token):
+    """Build a Twilio client once per account, shared across instances"""
+    from twilio.rest import Client
+    
+    return Client(account_sid, auth_token)
+
 class NotificationService:
     def __init__(self):
         """Initialize notification service with AWS credentials"""
@@ -26,19 +138,10 @@ class NotificationService:
         
         # Initialize AWS clients if credentials are available
         if self.aws_access_key and self.aws_secret_key:
+            credentials = (self.aws_access_key, self.aws_secret_key, self.aws_region)
             try:
-                self.sns_client = boto3.client(
-                    'sns',
-                    aws_access_key_id=self.aws_access_key,
-                    aws_secret_access_key=self.aws_secret_key,
-                    region_name=self.aws_region
-                )
-                self.location_client = boto3.client(
-                    'location',
-                    aws_access_key_id=self.aws_access_key,
-                    aws_secret_access_key=self.aws_secret_key,
-                    region_name=self.aws_region
-                )
+                self.sns_client = _get_aws_client('sns', *credentials)
+                self.location_client = _get_aws_client('location', *credentials)
             except Exception as e:
                 logger.error(f"Failed to initialize AWS clients: {e}")
         
@@ -47,6 +150,10 @@ class NotificationService:
         self.smtp_port = int(os.getenv('SMTP_PORT', 587))
         self.email_user = os.getenv('EMAIL_USER')
         self.email_password = os.getenv('EMAIL_PASSWORD')
+        self._smtp = None
+        self._smtp_sent = 0
+        self._smtp_lock = threading.Lock()
+        atexit.register(self._close_smtp)
         
         # SMS configuration (Twilio)
         self.twilio_account_sid = os.getenv('TWILIO_ACCOUNT_SID')
@@ -56,62 +163,130 @@ class NotificationService:
         
         if self.twilio_account_sid and self.twilio_auth_token:
             try:
-                self.twilio_client = Client(self.twilio_account_sid, self.twilio_auth_token)
+                self.twilio_client = _get_twilio(self.twilio_account_sid, self.twilio_auth_token)
             except Exception as e:
                 logger.error(f"Failed to initialize Twilio client: {e}")
+        
+        # Local facility export answers nearest-facility lookups without an AWS round-trip
+        self.facilities_file = os.getenv('MEDICAL_FACILITIES_FILE')
 
-    def send_email_alert(self, recipient_email, subject, message):
-        """Send email alert for high asthma risk"""
-        try:
-            if not (self.smtp_server and self.email_user and self.email_password):
-                logger.warning("Email configuration incomplete")
-                return False
-                
-            msg = MIMEMultipart()
-            msg['From'] = self.email_user
-            msg['To'] = recipient_email
-            msg['Subject'] = subject
-            
-            msg.attach(MIMEText(message, 'plain'))
+    def _send_email(self, recipient_email, subject, message):
+        """Deliver an email, raising on SMTP failures so callers can retry"""
+        if not (self.smtp_server and self.email_user and self.email_password):
+            logger.warning("Email configuration incomplete")
+            return False
             
+        msg = MIMEMultipart()
+        msg['From'] = self.email_user
+        msg['To'] = recipient_email
+        msg['Subject'] = subject
+        
+        msg.attach(MIMEText(message, 'plain'))
+        
+        text = msg.as_string()
+        with self._smtp_lock:
+            try:
+                self._get_smtp().sendmail(self.email_user, recipient_email, text)
+            except smtplib.SMTPServerDisconnected:
+                # The pooled session timed out server-side; reconnect once and resend
+                self._smtp = None
+                self._get_smtp().sendmail(self.email_user, recipient_email, text)
+            self._smtp_sent += 1
+        
+        logger.info(f"Email alert sent to {recipient_email}")
+        return True
+
+    def _get_smtp(self):
+        """Return the pooled SMTP session, connecting on first use (caller holds _smtp_lock)"""
+        if self._smtp is not None and self._smtp_sent >= SMTP_MAX_MESSAGES:
+            self._close_smtp_locked()
+        if self._smtp is None:
             server = smtplib.SMTP(self.smtp_server, self.smtp_port)
             server.starttls()
             server.login(self.email_user, self.email_password)
-            text = msg.as_string()
-            server.sendmail(self.email_user, recipient_email, text)
-            server.quit()
-            
-            logger.info(f"Email alert sent to {recipient_email}")
-            return True
+            self._smtp = server
+            self._smtp_sent = 0
+        return self._smtp
+
+    def _close_smtp_locked(self):
+        """Quit the pooled SMTP session (caller holds _smtp_lock)"""
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except OSError:
+                # Already dropped by the server; nothing left to close cleanly
+                pass
+            self._smtp = None
+
+    def _close_smtp(self):
+        """Quit the pooled SMTP session"""
+        with self._smtp_lock:
+            self._close_smtp_locked()
+
+    def send_email_alert(self, recipient_email, subject, message):
+        """Send email alert for high asthma risk"""
+        try:
+            return self._send_email(recipient_email, subject, message)
         except Exception as e:
             logger.error(f"Failed to send email alert: {e}")
             return False
 
+    def _send_sms(self, phone_number, message):
+        """Deliver an SMS, raising on provider failures so callers can retry"""
+        if self.twilio_client:
+            self.twilio_client.messages.create(
+                body=message,
+                from_=self.twilio_phone_number,
+                to=phone_number
+            )
+            logger.info(f"SMS alert sent to {phone_number}")
+            return True
+        elif self.sns_client:
+            self.sns_client.publish(
+                PhoneNumber=phone_number,
+                Message=message
+            )
+            logger.info(f"SMS alert sent via SNS to {phone_number}")
+            return True
+        else:
+            logger.warning("No SMS service configured")
+            return False
+
     def send_sms_alert(self, phone_number, message):
         """Send SMS alert for high asthma risk"""
         try:
-            if self.twilio_client:
-                message = self.twilio_client.messages.create(
-                    body=message,
-                    from_=self.twilio_phone_number,
-                    to=phone_number
-                )
-                logger.info(f"SMS alert sent to {phone_number}")
-                return True
-            elif self.sns_client:
-                response = self.sns_client.publish(
-                    PhoneNumber=phone_number,
-                    Message=message
-                )
-                logger.info(f"SMS alert sent via SNS to {phone_number}")
-                return True
-            else:
-                logger.warning("No SMS service configured")
-                return False
+            return self._send_sms(phone_number, message)
         except Exception as e:
             logger.error(f"Failed to send SMS alert: {e}")
             return False
 
+    def send_sms_batch(self, phone_numbers, message):
+        """Send the same SMS to many recipients, running deliveries concurrently"""
+        phone_numbers = iter(phone_numbers)
+        failed = []
+        sent = 0
+        
+        with ThreadPoolExecutor(max_workers=SMS_BATCH_SIZE) as executor:
+            while True:
+                chunk = list(islice(phone_numbers, SMS_BATCH_SIZE))
+                if not chunk:
+                    break
+                futures = [(phone, executor.submit(self._send_sms, phone, message)) for phone in chunk]
+                for phone, future in futures:
+                    try:
+                        if future.result():
+                            sent += 1
+                    except Exception as e:
+                        logger.warning(f"Batched SMS to {phone} failed, will retry: {e}")
+                        failed.append(phone)
+        
+        # Retry failures one at a time so a throttled provider isn't hit with a second burst
+        for phone in failed:
+            if self.send_sms_alert(phone, message):
+                sent += 1
+        
+        return sent
+
     def send_push_notification(self, device_token, title, message):
         """Send push notification (stub implementation)"""
         try:
@@ -124,8 +299,12 @@ class NotificationService:
             return False
 
     def find_nearest_medical_facility(self, latitude, longitude, max_results=5):
-        """Find nearest medical facilities using AWS Location Service"""
+        """Find nearest medical facilities, preferring the local index over AWS Location Service"""
         try:
+            facility_index = _get_facility_index(self.facilities_file)
+            if facility_index is not None:
+                return facility_index.query(latitude, longitude, max_results)
+            
             if not self.location_client:
                 logger.warning("AWS Location Service not configured")
                 return []
@@ -156,22 +335,39 @@ class NotificationService:
     def send_asthma_alert(self, user_info, risk_level, environmental_data):
         """Send comprehensive asthma alert with all notification methods"""
         try:
-            # Create alert message
-            message = self._create_alert_message(user_info, risk_level, environmental_data)
-            subject = f"Asthma Risk Alert: {risk_level} Risk Detected"
+            email = user_info.get('email')
+            phone = user_info.get('phone')
+            device_token = user_info.get('device_token')
+            if not (email or phone or device_token):
+                return False
+            
+            # Imported here because tasks.py imports this module
+            from .tasks import (send_email_alert_task, send_sms_alert_task, send_sms_batch_task,
+                                send_push_notification_task)
             
-            # Send email if email is provided
-            if user_info.get('email'):
-                self.send_email_alert(user_info['email'], subject, message)
+            # Only email and push carry the full message, so SMS-only alerts skip the facility lookup
+            if email or device_token:
+                message = self._create_alert_message(user_info, risk_level, environmental_data)
+                subject = f"Asthma Risk Alert: {risk_level} Risk Detected"
             
-            # Send SMS if phone number is provided
-            if user_info.get('phone'):
+            # Queue delivery so the request doesn't wait on SMTP/Twilio round-trips
+            if email:
+                send_email_alert_task.delay(email, subject, message)
+            
+            # Send SMS if phone number is provided; a list of numbers goes out as one batch task
+            if phone:
                 sms_message = f"Asthma Risk Alert: {risk_level} risk in your area. {environmental_data.get('pm25', 'N/A')} μg/m³ PM2.5."
-                self.send_sms_alert(user_info['phone'], sms_message)
+                if isinstance(phone, (list, tuple)):
+                    if len(phone) > 1:
+                        send_sms_batch_task.delay(list(phone), sms_message)
+                    else:
+                        send_sms_alert_task.delay(phone[0], sms_message)
+                else:
+                    send_sms_alert_task.delay(phone, sms_message)
             
             # Send push notification if device token is provided
-            if user_info.get('device_token'):
-                self.send_push_notification(user_info['device_token'], subject, message)
+            if device_token:
+                send_push_notification_task.delay(device_token, subject, message)
                 
             return True
         except Exception as e:
@@ -180,28 +376,7 @@ class NotificationService:
 
     def _create_alert_message(self, user_info, risk_level, environmental_data):
         """Create detailed alert message"""
-        message = f"""
-Asthma Risk Alert for {user_info.get('name', 'User')}
-
-Risk Level: {risk_level}
-Location: {user_info.get('city', 'Unknown')}
-
-Environmental Conditions:
-- PM2.5: {environmental_data.get('pm25', 'N/A')} μg/m³
-- PM10: {environmental_data.get('pm10', 'N/A')} μg/m³
-- Temperature: {environmental_data.get('temperature', 'N/A')}°C
-- Humidity: {environmental_data.get('humidity', 'N/A')}%
-- Pollen Level: {environmental_data.get('pollen_level', 'N/A')}
-
-Recommendations:
-1. Stay indoors during peak pollution hours
-2. Keep windows closed
-3. Use air purifier if available
-4. Take prescribed medication as scheduled
-5. Carry rescue inhaler
-
-Nearest Medical Facilities:
-"""
+        facility_lines = ''
         
         # Add nearest medical facilities if location is available
         if user_info.get('latitude') and user_info.get('longitude'):
@@ -209,15 +384,22 @@ Nearest Medical Facilities:
                 user_info['latitude'], 
                 user_info['longitude']
             )
-            if facilities:
-                for facility in facilities[:3]:  # Top 3 facilities
-                    message += f"- {facility['name']} ({facility['distance']:.1f} km away)\n"
-            else:
-                message += "Unable to locate nearby medical facilities.\n"
+            facility_lines = ''.join(
+                f"- {facility['name']} ({facility['distance']:.1f} km away)\n"
+                for facility in facilities[:3]  # Top 3 facilities
+            ) or "Unable to locate nearby medical facilities.\n"
         
-        message += "\nFor immediate medical assistance, call emergency services."
-        
-        return message
+        return ALERT_TEMPLATE.substitute(
+            name=user_info.get('name', 'User'),
+            risk_level=risk_level,
+            city=user_info.get('city', 'Unknown'),
+            pm25=environmental_data.get('pm25', 'N/A'),
+            pm10=environmental_data.get('pm10', 'N/A'),
+            temperature=environmental_data.get('temperature', 'N/A'),
+            humidity=environmental_data.get('humidity', 'N/A'),
+            pollen_level=environmental_data.get('pollen_level', 'N/A'),
+            facilities=facility_lines
+        )
 
 # Global notification service instance
 notification_service = NotificationService()
@@ -229,11 +411,13 @@ def send_asthma_alert(user_info, risk_level, environmental_data):
 def send_medication_reminder(user_info, medication_name, dosage_time):
     """Send medication reminder"""
     try:
+        from .tasks import send_email_alert_task, send_sms_alert_task, send_push_notification_task
+        
         message = f"Medication Reminder: Time to take {medication_name} ({dosage_time})"
         
         # Send email reminder
         if user_info.get('email'):
-            notification_service.send_email_alert(
+            send_email_alert_task.delay(
                 user_info['email'], 
                 "Medication Reminder", 
                 message
@@ -241,11 +425,11 @@ def send_medication_reminder(user_info, medication_name, dosage_time):
         
         # Send SMS reminder
         if user_info.get('phone'):
-            notification_service.send_sms_alert(user_info['phone'], message)
+            send_sms_alert_task.delay(user_info['phone'], message)
             
         # Send push notification
         if user_info.get('device_token'):
-            notification_service.send_push_notification(
+            send_push_notification_task.delay(
                 user_info['device_token'], 
                 "Medication Reminder", 
                 message
@@ -0,0 +1,45 @@
+"""
+Celery tasks for delivering AsthmaShield notifications off the request path
+"""
+
+import smtplib
+from celery import shared_task
+from .notifications import notification_service
+
+# Transient delivery failures worth retrying with backoff. The AWS and Twilio SDKs are
+# optional, so their error types are only included when the SDK is installed
+RETRYABLE_ERRORS = (smtplib.SMTPException,)
+
+try:
+    from botocore.exceptions import ClientError
+    RETRYABLE_ERRORS += (ClientError,)
+except ImportError:
+    pass
+
+try:
+    from twilio.base.exceptions import TwilioRestException
+    RETRYABLE_ERRORS += (TwilioRestException,)
+except ImportError:
+    pass
+
+@shared_task(bind=True, autoretry_for=RETRYABLE_ERRORS, retry_backoff=5, max_retries=3)
+def send_email_alert_task(self, recipient_email, subject, message):
+    """Deliver an email alert"""
+    return notification_service._send_email(recipient_email, subject, message)
+
+@shared_task(bind=True, autoretry_for=RETRYABLE_ERRORS, retry_backoff=5, max_retries=3)
+def send_sms_alert_task(self, phone_number, message):
+    """Deliver an SMS alert"""
+    return notification_service._send_sms(phone_number, message)
+
+# No autoretry: send_sms_batch already retries its own failures, and rerunning the
+# whole batch would text every recipient that did get the message a second time
+@shared_task
+def send_sms_batch_task(phone_numbers, message):
+    """Deliver one SMS alert to many recipients"""
+    return notification_service.send_sms_batch(phone_numbers, message)
+
+@shared_task(bind=True, autoretry_for=RETRYABLE_ERRORS, retry_backoff=5, max_retries=3)
+def send_push_notification_task(self, device_token, title, message):
+    """Deliver a push notification"""
+    return notification_service.send_push_notification(device_token, title, message)
@@ -3,6 +3,9 @@ from . import views
 
 urlpatterns = [
     path('predict/', views.PredictView.as_view(), name='predict'),
+    path('predict/batch/', views.PredictBatchView.as_view(), name='predict-batch'),
     path('medication-reminder/', views.MedicationReminderView.as_view(), name='medication-reminder'),
     path('symptom-report/', views.SymptomReportView.as_view(), name='symptom-report'),
+    path('symptom-report/batch/', views.SymptomReportBatchView.as_view(), name='symptom-report-batch'),
+    path('symptom-report/trends/', views.SymptomTrendsView.as_view(), name='symptom-trends'),
 ]
\ No newline at end of file
@@ -1,21 +1,164 @@
-from django.http import JsonResponse
+from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views import View
+from django.core.cache import cache
 import requests
+import httpx
+from requests.adapters import HTTPAdapter
+from asgiref.sync import sync_to_async
 import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-import json
-from .ml_model.model import predict_asthma_risk, get_feature_importance
+import orjson
+import numpy as np
+from .ml_model.model import predict_asthma_risk, predict_asthma_risk_batch, get_feature_importance
 from .notifications import send_asthma_alert, send_medication_reminder
-from .data_collection import save_symptom_report, get_local_symptom_reports
+from .data_collection import (save_symptom_report, save_symptom_reports, get_local_symptom_reports,
+                              get_local_severity_counts, report_mask, severity_category, SYMPTOM_ORDER)
 
 # Load environment variables
 load_dotenv()
 
+# Shared keep-alive session so repeat OpenWeather calls skip the TCP/TLS handshake
+HTTP = requests.Session()
+HTTP.mount('https://', HTTPAdapter(pool_connections=20, pool_maxsize=50))
+HTTP.mount('http://', HTTPAdapter(pool_connections=20, pool_maxsize=50))
+
+UPSTREAM_TIMEOUT = 5
+
+# Weather and air quality change over minutes, so share responses across requests
+CONDITIONS_CACHE_TTL = 300
+MAX_BATCH_CITIES = 20
+MAX_BATCH_REPORTS = 100
+# Community trends summarize this many of the most recent reports near a city
+TRENDS_RADIUS_KM = 10
+TRENDS_REPORT_LIMIT = 500
+
+# Decimal places for rounded numeric response fields
+RESPONSE_PRECISION = {
+    'temperature': 1,
+    'medication_adherence': 2,
+    'confidence': 2
+}
+PROBABILITY_PRECISION = 2
+
+def _json_default(obj):
+    """Serialize values orjson doesn't handle natively, such as pandas Timestamps"""
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+class OrjsonResponse(HttpResponse):
+    """JSON response serialized with orjson, accepting numpy arrays and scalars"""
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(
+            orjson.dumps(data, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY),
+            **kwargs
+        )
+
+def _round_response(data):
+    """Round numeric response fields in place, once, just before serialization"""
+    for field, ndigits in RESPONSE_PRECISION.items():
+        if data.get(field) is not None:
+            data[field] = round(data[field], ndigits)
+    if data.get('probabilities'):
+        data['probabilities'] = {
+            k: round(v, PROBABILITY_PRECISION) for k, v in data['probabilities'].items()
+        }
+    return data
+
+class UpstreamAPIError(Exception):
+    """Raised when the weather or AQI API returns an unusable response"""
+
+def _weather_cache_key(city):
+    return f"weather:{city.strip().lower().replace(' ', '_')}"
+
+def _aqi_cache_key(lat, lon):
+    # Nearby lookups (~1 km) share one AQI entry
+    return f"aqi:{round(lat, 2)}:{round(lon, 2)}"
+
+def _weather_url(city):
+    return f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={os.getenv('OPENWEATHER_API')}"
+
+def _aqi_url(lat, lon):
+    return f"http://api.openweathermap.org/data/2.5/air_pollution?lat={lat}&lon={lon}&appid={os.getenv('OPENWEATHER_API')}"
+
+def _check_weather(weather_data):
+    # Check if API call was successful
+    if weather_data.get('cod') != 200:
+        raise UpstreamAPIError(f"Weather API error: {weather_data.get('message', 'Unknown error')}")
+
+def _check_aqi(aqi_data):
+    # Check if AQI API call was successful
+    if not aqi_data.get('list'):
+        raise UpstreamAPIError('AQI data not available')
+
+def _extract_conditions(weather_data, aqi_data):
+    """Extract the model's environmental inputs from weather and AQI payloads"""
+    return {
+        'lat': weather_data['coord']['lat'],
+        'lon': weather_data['coord']['lon'],
+        'temperature': weather_data['main']['temp'] - 273.15,  # Convert from Kelvin to Celsius
+        'humidity': weather_data['main']['humidity'],
+        'pressure': weather_data['main']['pressure'],
+        'wind_speed': weather_data['wind']['speed'] if 'wind' in weather_data else 0,
+        'pm25': aqi_data['list'][0]['components']['pm2_5'],
+        'pm10': aqi_data['list'][0]['components']['pm10'],
+        'pollen_level': 50  # Default pollen level
+    }
+
+def fetch_conditions(city):
+    """Fetch weather and AQI for a city and extract the model's environmental inputs"""
+    weather_key = _weather_cache_key(city)
+    weather_data = cache.get(weather_key)
+    if weather_data is None:
+        weather_data = HTTP.get(_weather_url(city), timeout=UPSTREAM_TIMEOUT).json()
+        _check_weather(weather_data)
+        cache.set(weather_key, weather_data, CONDITIONS_CACHE_TTL)
+    
+    # Extract coordinates for AQI API
+    lat = weather_data['coord']['lat']
+    lon = weather_data['coord']['lon']
+    
+    aqi_key = _aqi_cache_key(lat, lon)
+    aqi_data = cache.get(aqi_key)
+    if aqi_data is None:
+        aqi_data = HTTP.get(_aqi_url(lat, lon), timeout=UPSTREAM_TIMEOUT).json()
+        _check_aqi(aqi_data)
+        cache.set(aqi_key, aqi_data, CONDITIONS_CACHE_TTL)
+    
+    return _extract_conditions(weather_data, aqi_data)
+
+async def afetch_conditions(city):
+    """Async fetch_conditions that awaits upstream calls instead of holding a worker thread"""
+    weather_key = _weather_cache_key(city)
+    weather_data = await cache.aget(weather_key)
+    # Scoped to this request: under WSGI each request runs on a fresh event loop
+    async with httpx.AsyncClient(timeout=UPSTREAM_TIMEOUT) as client:
+        if weather_data is None:
+            weather_data = (await client.get(_weather_url(city))).json()
+            _check_weather(weather_data)
+            await cache.aset(weather_key, weather_data, CONDITIONS_CACHE_TTL)
+        
+        # The AQI call needs the coordinates from the weather response
+        lat = weather_data['coord']['lat']
+        lon = weather_data['coord']['lon']
+        
+        aqi_key = _aqi_cache_key(lat, lon)
+        aqi_data = await cache.aget(aqi_key)
+        if aqi_data is None:
+            aqi_data = (await client.get(_aqi_url(lat, lon))).json()
+            _check_aqi(aqi_data)
+            await cache.aset(aqi_key, aqi_data, CONDITIONS_CACHE_TTL)
+    
+    return _extract_conditions(weather_data, aqi_data)
+
 @method_decorator(csrf_exempt, name='dispatch')
 class PredictView(View):
-    def get(self, request):
+    async def get(self, request):
         city = request.GET.get('city', 'Pune')
         
         # Get additional parameters (with defaults)
@@ -29,41 +172,19 @@ class PredictView(View):
         
         # Get weather and AQI data
         try:
-            # OpenWeather API calls
-            weather_url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={os.getenv('OPENWEATHER_API')}"
-            weather_response = requests.get(weather_url)
-            weather_data = weather_response.json()
-            
-            # Check if API call was successful
-            if weather_data.get('cod') != 200:
-                return JsonResponse({'error': f"Weather API error: {weather_data.get('message', 'Unknown error')}"}, status=400)
-            
-            # Extract coordinates for AQI API
-            lat = weather_data['coord']['lat']
-            lon = weather_data['coord']['lon']
-            
-            # AQI API call
-            aqi_url = f"http://api.openweathermap.org/data/2.5/air_pollution?lat={lat}&lon={lon}&appid={os.getenv('OPENWEATHER_API')}"
-            aqi_response = requests.get(aqi_url)
-            aqi_data = aqi_response.json()
-            
-            # Check if AQI API call was successful
-            if not aqi_data.get('list'):
-                return JsonResponse({'error': 'AQI data not available'}, status=400)
-            
-            # Extract environmental data
-            temperature = weather_data['main']['temp'] - 273.15  # Convert from Kelvin to Celsius
-            humidity = weather_data['main']['humidity']
-            pressure = weather_data['main']['pressure']
-            wind_speed = weather_data['wind']['speed'] if 'wind' in weather_data else 0
-            pm25 = aqi_data['list'][0]['components']['pm2_5']
-            pm10 = aqi_data['list'][0]['components']['pm10']
-            
-            # Use default values for missing data
-            pollen_level = 50  # Default pollen level
+            conditions = await afetch_conditions(city)
+            lat, lon = conditions['lat'], conditions['lon']
+            temperature = conditions['temperature']
+            humidity = conditions['humidity']
+            pressure = conditions['pressure']
+            wind_speed = conditions['wind_speed']
+            pm25 = conditions['pm25']
+            pm10 = conditions['pm10']
+            pollen_level = conditions['pollen_level']
             
             # Use ML model for prediction with confidence and XAI explanations
-            prediction_result = predict_asthma_risk(
+            # Inference and the XAI explainers are CPU-bound, so keep them off the event loop
+            prediction_result = await sync_to_async(predict_asthma_risk, thread_sensitive=False)(
                 pm25=pm25, pm10=pm10, temperature=temperature, humidity=humidity, 
                 pollen_level=pollen_level, wind_speed=wind_speed, pressure=pressure,
                 patient_age=patient_age, 
@@ -78,6 +199,7 @@ class PredictView(View):
             xai_explanations = prediction_result.get('xai_explanations', {})
             
             # Send alert if risk is high
+            alert = None
             if asthma_risk == 'High' and (user_email or user_phone):
                 user_info = {
                     'name': 'User',
@@ -98,8 +220,19 @@ class PredictView(View):
                     'pressure': pressure
                 }
                 
-                # Send alert notification
-                send_asthma_alert(user_info, asthma_risk, environmental_data)
+                # Send alert notification; the facility lookup and queueing overlap the report query
+                alert = sync_to_async(send_asthma_alert, thread_sensitive=False)(
+                    user_info, asthma_risk, environmental_data
+                )
+            
+            # Get local symptom reports
+            local_reports_query = sync_to_async(get_local_symptom_reports, thread_sensitive=False)(
+                lat, lon, radius_km=5, limit=10
+            )
+            if alert is not None:
+                _, local_reports = await asyncio.gather(alert, local_reports_query)
+            else:
+                local_reports = await local_reports_query
             
             # Get health advice
             advice = self.get_health_advice(
@@ -111,34 +244,33 @@ class PredictView(View):
             # Get feature importance
             feature_importance = get_feature_importance()
             
-            # Get local symptom reports
-            local_reports = get_local_symptom_reports(lat, lon, radius_km=5)
-            
             # Return JSON response
             response_data = {
                 'city': city,
                 'pm25': pm25,
                 'pm10': pm10,
-                'temperature': round(temperature, 1),
+                'temperature': temperature,
                 'humidity': humidity,
                 'pressure': pressure,
                 'wind_speed': wind_speed,
                 'pollen_level': pollen_level,
                 'patient_age': patient_age,
                 'patient_history_severe_attacks': patient_history_severe_attacks,
-                'medication_adherence': round(medication_adherence, 2),
+                'medication_adherence': medication_adherence,
                 'asthma_risk': asthma_risk,
-                'confidence': round(confidence, 2) if confidence else None,
-                'probabilities': {k: round(v, 2) for k, v in probabilities.items()} if probabilities else None,
+                'confidence': confidence,
+                'probabilities': probabilities,
                 'advice': advice,
                 'feature_importance': feature_importance,
                 'xai_explanations': xai_explanations,
-                'local_symptom_reports': local_reports[:10]  # Limit to 10 most recent
+                'local_symptom_reports': local_reports  # 10 most recent
             }
             
-            return JsonResponse(response_data)
+            return OrjsonResponse(_round_response(response_data))
+        except UpstreamAPIError as e:
+            return OrjsonResponse({'error': str(e)}, status=400)
         except Exception as e:
-            return JsonResponse({'error': str(e)}, status=500)
+            return OrjsonResponse({'error': str(e)}, status=500)
     
     def get_health_advice(self, risk_level, pm25, pm10, temp, humidity, 
                          patient_age, patient_history_severe_attacks, medication_adherence,
@@ -163,12 +295,58 @@ class PredictView(View):
         
         return base_advice + " " + risk_specific_advice.get(risk_level, "General advice: Monitor your symptoms and follow your asthma action plan.")
 
+@method_decorator(csrf_exempt, name='dispatch')
+class PredictBatchView(View):
+    def get(self, request):
+        """Predict asthma risk for several cities, fetching their conditions concurrently"""
+        cities = [c.strip() for c in request.GET.get('cities', '').split(',') if c.strip()]
+        if not cities:
+            return OrjsonResponse({'error': 'No cities provided'}, status=400)
+        if len(cities) > MAX_BATCH_CITIES:
+            return OrjsonResponse({'error': f'At most {MAX_BATCH_CITIES} cities per request'}, status=400)
+        
+        try:
+            patient_age = int(request.GET.get('patient_age', 35))
+            patient_history_severe_attacks = int(request.GET.get('patient_history_severe_attacks', 1))
+            medication_adherence = float(request.GET.get('medication_adherence', 0.8))
+            
+            def fetch(city):
+                try:
+                    return fetch_conditions(city)
+                except Exception as e:
+                    return {'error': str(e)}
+            
+            with ThreadPoolExecutor(max_workers=min(8, len(cities))) as executor:
+                fetched = list(executor.map(fetch, cities))
+            
+            ok = [i for i, conditions in enumerate(fetched) if 'error' not in conditions]
+            results = [{'city': city, **conditions} for city, conditions in zip(cities, fetched)]
+            
+            if ok:
+                # Score every city with one model call
+                features = np.array([
+                    [fetched[i]['pm25'], fetched[i]['pm10'], fetched[i]['temperature'],
+                     fetched[i]['humidity'], fetched[i]['pollen_level'], fetched[i]['wind_speed'],
+                     fetched[i]['pressure'], patient_age, patient_history_severe_attacks,
+                     medication_adherence]
+                    for i in ok
+                ])
+                batch = predict_asthma_risk_batch(features)
+                for row, i in enumerate(ok):
+                    results[i]['asthma_risk'] = str(batch['risk_levels'][row])
+                    if batch['confidences'] is not None:
+                        results[i]['confidence'] = float(batch['confidences'][row])
+            
+            return OrjsonResponse({'results': [_round_response(result) for result in results]})
+        except Exception as e:
+            return OrjsonResponse({'error': str(e)}, status=500)
+
 @method_decorator(csrf_exempt, name='dispatch')
 class MedicationReminderView(View):
     def post(self, request):
         """Handle medication reminder requests"""
         try:
-            data = json.loads(request.body)
+            data = orjson.loads(request.body)
             
             user_info = {
                 'name': data.get('name', 'User'),
@@ -182,62 +360,118 @@ class MedicationReminderView(View):
             
             success = send_medication_reminder(user_info, medication_name, dosage_time)
             
-            return JsonResponse({
+            return OrjsonResponse({
                 'success': success,
                 'message': 'Medication reminder sent' if success else 'Failed to send medication reminder'
             })
         except Exception as e:
-            return JsonResponse({'error': str(e)}, status=500)
+            return OrjsonResponse({'error': str(e)}, status=500)
 
 @method_decorator(csrf_exempt, name='dispatch')
 class SymptomReportView(View):
     def post(self, request):
         """Handle symptom reports from users"""
         try:
-            data = json.loads(request.body)
+            data = orjson.loads(request.body)
             
             # Save the symptom report
             report_id = save_symptom_report(data)
             
             # Process symptom report
-            symptoms = data.get('symptoms', {})
+            mask = report_mask(data)
             location = data.get('location', {})
             user_id = data.get('user_id', 'anonymous')
             
             report_summary = {
                 'user_id': user_id,
                 'timestamp': data.get('timestamp', ''),
-                'symptoms': symptoms,
+                'symptom_mask': mask,
                 'location': location,
-                'severity': self.calculate_severity(symptoms)
+                'severity': self.calculate_severity(mask)
             }
             
-            return JsonResponse({
+            return OrjsonResponse({
                 'success': True,
                 'message': 'Symptom report received',
                 'report_id': report_id
             })
         except Exception as e:
-            return JsonResponse({'error': str(e)}, status=500)
+            return OrjsonResponse({'error': str(e)}, status=500)
     
-    def calculate_severity(self, symptoms):
-        """Calculate severity based on reported symptoms"""
-        severity_score = 0
-        severity_map = {
-            'wheezing': 3,
-            'shortness_of_breath': 3,
-            'chest_tightness': 2,
-            'coughing': 2,
-            'difficulty_sleeping': 1
-        }
-        
-        for symptom, present in symptoms.items():
-            if present and symptom in severity_map:
-                severity_score += severity_map[symptom]
-        
-        if severity_score >= 5:
-            return 'High'
-        elif severity_score >= 3:
-            return 'Moderate'
-        else:
-            return 'Low'
\ No newline at end of file
+    def calculate_severity(self, mask):
+        """Calculate severity from a report's symptom mask"""
+        return severity_category(mask)
+
+def _report_error(report):
+    """Why a batched report can't be saved, or None if it is well formed"""
+    if not isinstance(report, dict):
+        return 'report must be an object'
+    mask = report.get('symptom_mask')
+    if 'symptom_mask' in report and (
+            isinstance(mask, bool) or not isinstance(mask, int) or not 0 <= mask < 1 << len(SYMPTOM_ORDER)):
+        return f'symptom_mask must be an integer from 0 to {(1 << len(SYMPTOM_ORDER)) - 1}'
+    if 'timestamp_ns' in report and (isinstance(report['timestamp_ns'], bool)
+                                     or not isinstance(report['timestamp_ns'], int)):
+        return 'timestamp_ns must be an integer'
+    for field in ('symptoms', 'location'):
+        if not isinstance(report.get(field, {}), dict):
+            return f'{field} must be an object'
+    for field in ('timestamp', 'user_id', 'report_key'):
+        if not isinstance(report.get(field, ''), str):
+            return f'{field} must be a string'
+    return None
+
+@method_decorator(csrf_exempt, name='dispatch')
+class SymptomReportBatchView(View):
+    def post(self, request):
+        """Handle a JSON array of symptom reports queued by the frontend"""
+        try:
+            reports = orjson.loads(request.body)
+            if not isinstance(reports, list) or not reports:
+                return OrjsonResponse({'error': 'Expected a non-empty list of reports'}, status=400)
+            if len(reports) > MAX_BATCH_REPORTS:
+                return OrjsonResponse({'error': f'At most {MAX_BATCH_REPORTS} reports per request'}, status=400)
+            
+            # Reject malformed reports up front, naming the first bad one, rather than failing mid-save
+            for index, report in enumerate(reports):
+                error = _report_error(report)
+                if error is not None:
+                    return OrjsonResponse({'error': f'Report {index}: {error}', 'index': index}, status=400)
+            
+            # Save every report in one transaction
+            report_ids = save_symptom_reports(reports)
+            
+            return OrjsonResponse({
+                'success': True,
+                'message': f'{len(report_ids)} symptom reports received',
+                'report_ids': report_ids
+            })
+        except Exception as e:
+            return OrjsonResponse({'error': str(e)}, status=500)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class SymptomTrendsView(View):
+    def get(self, request):
+        """Summarize the severity of recent symptom reports around a city"""
+        city = request.GET.get('city', 'Pune')
+        try:
+            conditions = fetch_conditions(city)
+            counts = get_local_severity_counts(
+                conditions['lat'], conditions['lon'],
+                radius_km=TRENDS_RADIUS_KM, limit=TRENDS_REPORT_LIMIT
+            )
+            
+            levels = list(counts)
+            totals = np.array([counts[level] for level in levels])
+            total = int(totals.sum())
+            shares = np.round(totals / total, PROBABILITY_PRECISION) if total else np.zeros(len(levels))
+            
+            return OrjsonResponse({
+                'city': city,
+                'total_reports': total,
+                'severity_share': dict(zip(levels, shares.tolist()))
+            })
+        except UpstreamAPIError as e:
+            return OrjsonResponse({'error': str(e)}, status=400)
+        except Exception as e:
+            return OrjsonResponse({'error': str(e)}, status=500)
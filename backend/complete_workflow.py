@@ -32,14 +32,10 @@ def run_workflow():
     # Step 3: Train ML models
     print("\nStep 3: Training ML models...")
     try:
-        # Train Random Forest (default)
+        # One run trains every model family in parallel and saves the best; --model isn't
+        # read yet, so a second run would only repeat it and race on the saved artifacts
         subprocess.run([sys.executable, "train_model.py"], check=True, cwd="backend")
-        print("✓ Random Forest model trained successfully")
-        
-        # Train Logistic Regression
-        subprocess.run([sys.executable, "train_model.py", "--model", "logistic_regression"], 
-                      check=True, cwd="backend")
-        print("✓ Logistic Regression model trained successfully")
+        print("✓ ML models trained and the best one saved")
     except subprocess.CalledProcessError:
         print("✗ Failed to train ML models")
         return
@@ -66,8 +62,10 @@ def run_workflow():
     print("🎉 Complete workflow demonstration finished successfully!")
     print("\nNext steps:")
     print("1. Start the Django backend: python manage.py runserver")
-    print("2. Start the Streamlit frontend: streamlit run app.py")
-    print("3. Access the application at http://localhost:8501")
+    print("2. Start the notification worker: celery -A asthmashield worker -l info")
+    print("   (set CELERY_BROKER_URL, e.g. redis://localhost:6379/0; without it alerts are sent inline)")
+    print("3. Start the Streamlit frontend: streamlit run app.py")
+    print("4. Access the application at http://localhost:8501")
 
 if __name__ == "__main__":
     run_workflow()
\ No newline at end of file
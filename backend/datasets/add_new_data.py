@@ -2,44 +2,51 @@
 Script to demonstrate adding new data to the asthma dataset
 """
 
+import os
 import pandas as pd
-import random
+import numpy as np
 
-def add_new_data():
+DATA_PATH = 'datasets/asthma_data.csv'
+PARQUET_PATH = 'datasets/asthma_data.parquet'
+
+def count_rows(path):
+    """Count data rows in a CSV without parsing it"""
+    with open(path, 'rb') as f:
+        return sum(1 for _ in f) - 1
+
+def add_new_data(n_samples=5):
     """Demonstrate adding new data to the dataset"""
-    # Load existing dataset
-    df = pd.read_csv('datasets/asthma_data.csv')
-    print(f"Original dataset size: {len(df)} samples")
-    
-    # Generate new sample data
-    new_data = []
-    for i in range(5):  # Add 5 new samples
-        sample = {
-            'pm25': round(random.uniform(0, 300), 1),
-            'pm10': round(random.uniform(0, 400), 1),
-            'temperature': round(random.uniform(-10, 50), 1),
-            'humidity': round(random.uniform(0, 100), 1),
-            'pollen_level': round(random.uniform(0, 100), 1),
-            'wind_speed': round(random.uniform(0, 20), 1),
-            'pressure': round(random.uniform(980, 1040), 1),
-            'patient_age': random.randint(5, 80),
-            'patient_history_severe_attacks': random.randint(0, 10),
-            'medication_adherence': round(random.uniform(0.5, 1.0), 2),
-            'asthma_risk': random.choice(['Low', 'Moderate', 'High'])
-        }
-        new_data.append(sample)
-    
-    # Convert to DataFrame
-    new_df = pd.DataFrame(new_data)
+    # Only the row count is needed from the existing dataset
+    exists = os.path.exists(DATA_PATH)
+    original_size = count_rows(DATA_PATH) if exists else 0
+    print(f"Original dataset size: {original_size} samples")
     
-    # Combine with existing data
-    combined_df = pd.concat([df, new_df], ignore_index=True)
+    # Generate new sample data, one vectorized draw per column
+    rng = np.random.default_rng()
+    new_df = pd.DataFrame({
+        'pm25': rng.uniform(0, 300, n_samples).round(1),
+        'pm10': rng.uniform(0, 400, n_samples).round(1),
+        'temperature': rng.uniform(-10, 50, n_samples).round(1),
+        'humidity': rng.uniform(0, 100, n_samples).round(1),
+        'pollen_level': rng.uniform(0, 100, n_samples).round(1),
+        'wind_speed': rng.uniform(0, 20, n_samples).round(1),
+        'pressure': rng.uniform(980, 1040, n_samples).round(1),
+        'patient_age': rng.integers(5, 81, n_samples),
+        'patient_history_severe_attacks': rng.integers(0, 11, n_samples),
+        'medication_adherence': rng.uniform(0.5, 1.0, n_samples).round(2),
+        'asthma_risk': rng.choice(['Low', 'Moderate', 'High'], n_samples)
+    })
     
-    # Save updated dataset
-    combined_df.to_csv('datasets/asthma_data.csv', index=False)
+    # Append only the new rows, matching the existing header's column order
+    if exists:
+        new_df = new_df[pd.read_csv(DATA_PATH, nrows=0).columns]
+    new_df.to_csv(DATA_PATH, mode='a', header=not exists, index=False)
+    # The Parquet copy is now stale; analyze_data rebuilds it on next load
+    if os.path.exists(PARQUET_PATH):
+        os.remove(PARQUET_PATH)
     
     print(f"Added {len(new_df)} new samples")
-    print(f"Updated dataset size: {len(combined_df)} samples")
+    print(f"Updated dataset size: {original_size + len(new_df)} samples")
     print("\nNew samples added:")
     print(new_df)
     
@@ -2,15 +2,34 @@
 Data analysis script for AsthmaShield dataset
 """
 
+import os
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.preprocessing import LabelEncoder
+
+CSV_PATH = 'asthma_data.csv'
+PARQUET_PATH = 'asthma_data.parquet'
+RISK_LEVELS = ['Low', 'Moderate', 'High']
+
+def load_dataset(csv_path=CSV_PATH, parquet_path=PARQUET_PATH):
+    """Load the dataset from its Parquet copy, rebuilding it when the CSV is newer"""
+    if (os.path.exists(parquet_path)
+            and os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)):
+        return pd.read_parquet(parquet_path, engine='pyarrow')
+
+    df = pd.read_csv(csv_path)
+    df['asthma_risk'] = pd.Categorical(df['asthma_risk'], categories=RISK_LEVELS, ordered=True)
+    df.to_parquet(parquet_path, engine='pyarrow', compression='snappy', index=False)
+    return df
 
 def analyze_dataset():
     """Analyze the asthma dataset"""
+    # Plotting libraries are only needed here; Agg skips GUI backend probing
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    
     # Load the dataset
-    df = pd.read_csv('asthma_data.csv')
+    df = load_dataset()
     
     # Display basic information
     print("Dataset Info:")
@@ -28,12 +47,9 @@ def analyze_dataset():
     
     # Correlation matrix
     print("\nCorrelation with Asthma Risk:")
-    # Encode categorical variables for correlation analysis
-    df_encoded = df.copy()
-    le = LabelEncoder()
-    df_encoded['asthma_risk'] = le.fit_transform(df_encoded['asthma_risk'])
-    
-    correlation = df_encoded.corr()
+    # Correlate against the ordinal risk codes without copying the frame
+    risk_codes = pd.Categorical(df['asthma_risk'], categories=RISK_LEVELS, ordered=True).codes
+    correlation = df.assign(asthma_risk=risk_codes).corr(numeric_only=True)
     asthma_risk_corr = correlation['asthma_risk']
     print(asthma_risk_corr)
     
@@ -97,7 +113,7 @@ def analyze_dataset():
     
     plt.tight_layout()
     plt.savefig('dataset_analysis.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    plt.close()
     
     print("\nAnalysis complete. Plot saved as 'dataset_analysis.png'")
 
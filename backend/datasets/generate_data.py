@@ -2,10 +2,37 @@
 Script to generate realistic and diverse asthma training data for different cities
 """
 
+import argparse
+import os
 import pandas as pd
 import numpy as np
-import random
-from datetime import datetime
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from joblib import Parallel, delayed
+
+# Fallback generator for direct generate_realistic_batch calls
+_RNG = np.random.default_rng()
+
+RISK_LABELS = np.array(['Low', 'Moderate', 'High'], dtype=object)
+RISK_THRESHOLDS = (2, 4)
+
+# Score shift applied to every sample from a city with the given base risk
+BASE_RISK_OFFSET = {'High': 1, 'Moderate': 0, 'Low': -1}
+
+# Narrow dtypes comfortably cover the generated value ranges
+COLUMN_DTYPES = {
+    'pm25': np.float32,
+    'pm10': np.float32,
+    'temperature': np.float32,
+    'humidity': np.float32,
+    'pollen_level': np.float32,
+    'wind_speed': np.float32,
+    'pressure': np.float32,
+    'patient_age': np.int16,
+    'patient_history_severe_attacks': np.int16,
+    'medication_adherence': np.float32,
+    'asthma_risk': object
+}
 
 def generate_city_data():
     """Define realistic data ranges for different cities"""
@@ -93,167 +120,176 @@ def generate_city_data():
     }
     return cities_data
 
-def generate_realistic_sample(city_data, base_risk, patient_age=None):
-    """Generate a realistic sample based on city data and risk factors"""
+def generate_realistic_batch(city_data, n, patient_age=None, rng=None, base_offset=None):
+    """Generate n realistic samples for a city as a dict of NumPy columns"""
+    rng = rng or _RNG
+    if base_offset is None:
+        base_offset = BASE_RISK_OFFSET[city_data['base_risk']]
+    
     # Generate patient data
     if patient_age is None:
-        patient_age = random.randint(5, 80)
-    
-    patient_history_severe_attacks = random.randint(0, 10)
-    medication_adherence = random.uniform(0.5, 1.0)
+        patient_age = rng.integers(5, 81, n)
     
-    # Get city-specific environmental data ranges
-    pm25_min, pm25_max = city_data['pm25_range']
-    pm10_min, pm10_max = city_data['pm10_range']
-    humidity_min, humidity_max = city_data['humidity_range']
-    temp_min, temp_max = city_data['temperature_range']
-    pollen_min, pollen_max = city_data['pollen_range']
+    patient_history_severe_attacks = rng.integers(0, 11, n)
+    medication_adherence = rng.uniform(0.5, 1.0, n)
     
-    # Generate environmental data
-    pm25 = random.uniform(pm25_min, pm25_max)
-    pm10 = random.uniform(pm10_min, pm10_max)
-    humidity = random.uniform(humidity_min, humidity_max)
-    temperature = random.uniform(temp_min, temp_max)
-    pollen_level = random.uniform(pollen_min, pollen_max)
-    wind_speed = random.uniform(0.5, 15.0)
-    pressure = random.uniform(990, 1030)
+    # Generate environmental data from the city-specific ranges
+    pm25 = rng.uniform(*city_data['pm25_range'], n)
+    pm10 = rng.uniform(*city_data['pm10_range'], n)
+    humidity = rng.uniform(*city_data['humidity_range'], n)
+    temperature = rng.uniform(*city_data['temperature_range'], n)
+    pollen_level = rng.uniform(*city_data['pollen_range'], n)
+    wind_speed = rng.uniform(0.5, 15.0, n)
+    pressure = rng.uniform(990, 1030, n)
     
-    # Adjust risk based on environmental and patient factors
-    env_risk_score = 0
-    if pm25 > 150 or pm10 > 200:
-        env_risk_score += 2
-    elif pm25 > 75 or pm10 > 125:
-        env_risk_score += 1
-        
-    if temperature < 5 or temperature > 40:
-        env_risk_score += 1
-        
-    if humidity < 30 or humidity > 80:
-        env_risk_score += 1
-        
-    if pollen_level > 70:
-        env_risk_score += 2
-    elif pollen_level > 40:
-        env_risk_score += 1
+    # Adjust risk based on environmental and patient factors. Each upper threshold implies
+    # the lower one, so summing both comparisons gives the 0/1/2 ladder without branches
+    env_risk_score = (
+        ((pm25 > 75) | (pm10 > 125)).astype(np.int8) + ((pm25 > 150) | (pm10 > 200))
+        + ((temperature < 5) | (temperature > 40))
+        + ((humidity < 30) | (humidity > 80))
+        + (pollen_level > 40) + (pollen_level > 70)
+    )
     
     # Patient risk factors
-    patient_risk_score = 0
-    if patient_age < 10 or patient_age > 65:
-        patient_risk_score += 1
-        
-    if patient_history_severe_attacks > 3:
-        patient_risk_score += 2
-    elif patient_history_severe_attacks > 1:
-        patient_risk_score += 1
-        
-    if medication_adherence < 0.7:
-        patient_risk_score += 2
-    elif medication_adherence < 0.9:
-        patient_risk_score += 1
-    
-    # Combine scores to determine risk level
-    total_risk_score = env_risk_score + patient_risk_score
+    patient_risk_score = (
+        ((patient_age < 10) | (patient_age > 65)).astype(np.int8)
+        + (patient_history_severe_attacks > 1) + (patient_history_severe_attacks > 3)
+        + (medication_adherence < 0.9) + (medication_adherence < 0.7)
+    )
     
-    # Adjust based on city's base risk
-    if city_data['base_risk'] == 'High':
-        total_risk_score += 1
-    elif city_data['base_risk'] == 'Low':
-        total_risk_score -= 1
+    # Combine scores and adjust by the city's base risk to determine risk level
+    total_risk_score = env_risk_score + patient_risk_score + base_offset
     
-    # Determine final risk level
-    if total_risk_score >= 4:
-        asthma_risk = 'High'
-    elif total_risk_score >= 2:
-        asthma_risk = 'Moderate'
-    else:
-        asthma_risk = 'Low'
+    # Determine final risk level: <2 Low, 2-3 Moderate, >=4 High
+    asthma_risk = RISK_LABELS[np.digitize(total_risk_score, RISK_THRESHOLDS)]
     
     return {
-        'pm25': round(pm25, 1),
-        'pm10': round(pm10, 1),
-        'temperature': round(temperature, 1),
-        'humidity': round(humidity, 1),
-        'pollen_level': round(pollen_level, 1),
-        'wind_speed': round(wind_speed, 1),
-        'pressure': round(pressure, 1),
+        'pm25': pm25.round(1),
+        'pm10': pm10.round(1),
+        'temperature': temperature.round(1),
+        'humidity': humidity.round(1),
+        'pollen_level': pollen_level.round(1),
+        'wind_speed': wind_speed.round(1),
+        'pressure': pressure.round(1),
         'patient_age': patient_age,
         'patient_history_severe_attacks': patient_history_severe_attacks,
-        'medication_adherence': round(medication_adherence, 2),
+        'medication_adherence': medication_adherence.round(2),
         'asthma_risk': asthma_risk
     }
 
-def generate_diverse_dataset(n_samples_per_city=200):
+def bump_risk(asthma_risk):
+    """Raise Low to Moderate and Moderate to High"""
+    return np.where(asthma_risk == 'Low', 'Moderate',
+                    np.where(asthma_risk == 'Moderate', 'High', asthma_risk)).astype(object)
+
+def generate_city_batches(city_data, n_samples_per_city, n_profile_samples, seed):
+    """Generate one city's base and patient-profile batches from its own generator"""
+    rng = np.random.default_rng(seed)
+    base_offset = BASE_RISK_OFFSET[city_data['base_risk']]
+    batches = []
+    
+    # Generate samples for this city
+    batches.append(generate_realistic_batch(
+        city_data, n_samples_per_city, rng=rng, base_offset=base_offset))
+    
+    # Generate some samples with different patient profiles for the same city
+    # Young patients
+    batches.append(generate_realistic_batch(
+        city_data, n_profile_samples, patient_age=rng.integers(5, 19, n_profile_samples),
+        rng=rng, base_offset=base_offset))
+    
+    # Elderly patients
+    batches.append(generate_realistic_batch(
+        city_data, n_profile_samples, patient_age=rng.integers(65, 81, n_profile_samples),
+        rng=rng, base_offset=base_offset))
+    
+    # Patients with severe history
+    batch = generate_realistic_batch(city_data, n_profile_samples, rng=rng, base_offset=base_offset)
+    batch['patient_history_severe_attacks'] = rng.integers(4, 11, n_profile_samples)
+    # Recalculate risk based on new patient profile
+    batch['asthma_risk'] = bump_risk(batch['asthma_risk'])
+    batches.append(batch)
+    
+    # Patients with poor medication adherence
+    batch = generate_realistic_batch(city_data, n_profile_samples, rng=rng, base_offset=base_offset)
+    batch['medication_adherence'] = rng.uniform(0.3, 0.7, n_profile_samples)
+    # Recalculate risk based on new patient profile
+    batch['asthma_risk'] = bump_risk(batch['asthma_risk'])
+    batches.append(batch)
+    
+    return batches
+
+def generate_diverse_dataset(n_samples_per_city=200, n_profile_samples=50, seed=None, n_jobs=1):
     """Generate a diverse dataset with samples from different cities and risk levels"""
     cities_data = generate_city_data()
-    data = []
     
-    # Generate samples for each city
-    for city, city_data in cities_data.items():
-        print(f"Generating data for {city}...")
-        
-        # Generate samples for this city
-        for _ in range(n_samples_per_city):
-            sample = generate_realistic_sample(city_data, city_data['base_risk'])
-            data.append(sample)
-        
-        # Generate some samples with different patient profiles for the same city
-        for _ in range(50):
-            # Young patient
-            sample = generate_realistic_sample(city_data, city_data['base_risk'], patient_age=random.randint(5, 18))
-            data.append(sample)
-            
-            # Elderly patient
-            sample = generate_realistic_sample(city_data, city_data['base_risk'], patient_age=random.randint(65, 80))
-            data.append(sample)
-            
-            # Patient with severe history
-            sample = generate_realistic_sample(city_data, city_data['base_risk'])
-            sample['patient_history_severe_attacks'] = random.randint(4, 10)
-            # Recalculate risk based on new patient profile
-            if sample['asthma_risk'] != 'High':
-                sample['asthma_risk'] = 'Moderate' if sample['asthma_risk'] == 'Low' else 'High'
-            data.append(sample)
-            
-            # Patient with poor medication adherence
-            sample = generate_realistic_sample(city_data, city_data['base_risk'])
-            sample['medication_adherence'] = random.uniform(0.3, 0.7)
-            # Recalculate risk based on new patient profile
-            if sample['asthma_risk'] != 'High':
-                sample['asthma_risk'] = 'Moderate' if sample['asthma_risk'] == 'Low' else 'High'
-            data.append(sample)
+    # Independent child seeds keep cities reproducible however they are scheduled
+    seed_seq = np.random.SeedSequence(seed)
+    city_seeds = seed_seq.spawn(len(cities_data))
+    
+    print(f"Generating data for {', '.join(cities_data)}...")
+    city_batches = Parallel(n_jobs=n_jobs)(
+        delayed(generate_city_batches)(city_data, n_samples_per_city, n_profile_samples, city_seed)
+        for city_data, city_seed in zip(cities_data.values(), city_seeds)
+    )
+    
+    # Fill typed columns in place, one slice per batch
+    n_total = len(cities_data) * (n_samples_per_city + 4 * n_profile_samples)
+    columns = {col: np.empty(n_total, dtype=dtype) for col, dtype in COLUMN_DTYPES.items()}
+    offset = 0
+    for batches in city_batches:
+        for batch in batches:
+            n = len(batch['asthma_risk'])
+            for col, values in batch.items():
+                columns[col][offset:offset + n] = values
+            offset += n
     
-    # Convert to DataFrame
-    df = pd.DataFrame(data)
+    df = pd.DataFrame(columns)
     
     # Shuffle the data
-    df = df.sample(frac=1).reset_index(drop=True)
+    df = df.sample(frac=1, random_state=np.random.default_rng(seed_seq)).reset_index(drop=True)
     
     print(f"Generated {len(df)} samples from {len(cities_data)} cities")
     print(f"Risk distribution:\n{df['asthma_risk'].value_counts()}")
     
     return df
 
+def write_csv(df, filepath):
+    """Write a DataFrame as CSV through Arrow's writer, in the same unquoted layout as to_csv"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with open(filepath, 'wb') as f:
+        f.write((','.join(df.columns) + '\n').encode())
+        pa_csv.write_csv(table, f, pa_csv.WriteOptions(include_header=False, quoting_style='none'))
+
 def save_data(df, filename='asthma_data_enhanced.csv'):
     """Save data to CSV file"""
     filepath = os.path.join('datasets', filename)
-    df.to_csv(filepath, index=False)
+    write_csv(df, filepath)
+    print(f"Data saved to {filepath}")
+
+def save_parquet(df, filename='asthma_data_enhanced.parquet'):
+    """Save data to Snappy-compressed Parquet for Arrow-based readers"""
+    filepath = os.path.join('datasets', filename)
+    df.to_parquet(filepath, engine='pyarrow', compression='snappy', index=False)
     print(f"Data saved to {filepath}")
 
 def combine_with_existing_data(new_df):
     """Combine new data with existing dataset"""
     try:
-        # Load existing data
+        # Load existing data with the generated dtypes so float32 columns aren't widened on concat
         existing_path = os.path.join('datasets', 'asthma_data.csv')
-        existing_df = pd.read_csv(existing_path)
+        existing_df = pd.read_csv(existing_path, dtype=new_df.dtypes.to_dict())
         
         # Combine datasets
         combined_df = pd.concat([existing_df, new_df], ignore_index=True)
         
-        # Remove duplicates
-        combined_df = combined_df.drop_duplicates()
+        # Remove duplicates by comparing one uint64 hash per row instead of every column
+        row_hashes = pd.util.hash_pandas_object(combined_df, index=False)
+        combined_df = combined_df.loc[~row_hashes.duplicated().to_numpy()]
         
         # Save combined dataset
-        combined_df.to_csv(existing_path, index=False)
+        write_csv(combined_df, existing_path)
         print(f"Combined dataset saved to {existing_path}")
         print(f"Total samples: {len(combined_df)}")
         print(f"Risk distribution:\n{combined_df['asthma_risk'].value_counts()}")
@@ -261,19 +297,27 @@ def combine_with_existing_data(new_df):
         return combined_df
     except FileNotFoundError:
         # If no existing data, just save the new data
-        new_df.to_csv(os.path.join('datasets', 'asthma_data.csv'), index=False)
+        write_csv(new_df, os.path.join('datasets', 'asthma_data.csv'))
         print("Created new dataset file")
         return new_df
 
-if __name__ == "__main__":
-    import os
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate synthetic asthma training data')
+    parser.add_argument('--seed', type=int, default=None,
+                       help='Seed the generator for reproducible data')
+    parser.add_argument('--n-jobs', type=int, default=1,
+                       help='Worker processes for per-city generation (-1 for all cores)')
+    args = parser.parse_args(argv)
     
     print("Generating enhanced asthma dataset...")
     
     # Generate diverse dataset
-    df = generate_diverse_dataset(n_samples_per_city=300)
+    df = generate_diverse_dataset(n_samples_per_city=300, seed=args.seed, n_jobs=args.n_jobs)
     
     # Combine with existing data
     combined_df = combine_with_existing_data(df)
     
-    print("\nDataset generation completed successfully!")
\ No newline at end of file
+    print("\nDataset generation completed successfully!")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
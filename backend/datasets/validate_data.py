@@ -6,14 +6,40 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sklearn.preprocessing import LabelEncoder
 import os
 
+RISK_LEVELS = ['Low', 'Moderate', 'High']
+
+# Measurements fit float32 and the target is categorical; halves the frame's memory
+LOAD_DTYPES = {
+    'pm25': 'float32',
+    'pm10': 'float32',
+    'temperature': 'float32',
+    'humidity': 'float32',
+    'pollen_level': 'float32',
+    'wind_speed': 'float32',
+    'pressure': 'float32',
+    'medication_adherence': 'float32',
+    'asthma_risk': 'category'
+}
+INTEGER_COLUMNS = ['patient_age', 'patient_history_severe_attacks']
+
+# Statistics reported per column, overall and by risk level
+SUMMARY_STATS = ['mean', 'std', 'min', 'max', 'count']
+
+# Enough for on-screen review at a quarter of the pixels of 300 dpi
+PLOT_DPI = 150
+
 def load_dataset():
     """Load the asthma dataset"""
     try:
         data_path = os.path.join('datasets', 'asthma_data.csv')
-        df = pd.read_csv(data_path)
+        # The pyarrow engine parses the CSV on multiple threads
+        df = pd.read_csv(data_path, engine='pyarrow', dtype=LOAD_DTYPES)
+        # Integer columns are downcast after parsing so missing values still load (as floats)
+        for col in INTEGER_COLUMNS:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], downcast='integer')
         print(f"Dataset loaded successfully: {df.shape[0]} rows, {df.shape[1]} columns")
         return df
     except FileNotFoundError:
@@ -73,57 +99,72 @@ def validate_value_ranges(df):
         'medication_adherence': (0, 1)
     }
     
+    # Check every column against its bounds in one pass over the numeric block
+    cols = [col for col in expected_ranges if col in df.columns]
+    lo = np.array([expected_ranges[col][0] for col in cols])
+    hi = np.array([expected_ranges[col][1] for col in cols])
+    values = df[cols].to_numpy()
+    # NaN fails both comparisons, so missing values are counted separately instead of passing
+    nan_counts = np.isnan(values).sum(axis=0)
+    out_of_range_counts = ((values < lo) | (values > hi)).sum(axis=0)
+    col_min = np.nanmin(values, axis=0)
+    col_max = np.nanmax(values, axis=0)
+    
     issues_found = []
     
-    for col, (min_val, max_val) in expected_ranges.items():
-        if col in df.columns:
-            out_of_range = df[(df[col] < min_val) | (df[col] > max_val)]
-            if len(out_of_range) > 0:
-                issues_found.append((col, len(out_of_range)))
-                print(f"⚠ {col}: {len(out_of_range)} values out of range [{min_val}, {max_val}]")
-                print(f"  Min: {df[col].min()}, Max: {df[col].max()}")
-            else:
-                print(f"✓ {col}: All values within range [{min_val}, {max_val}]")
+    for i, col in enumerate(cols):
+        min_val, max_val = expected_ranges[col]
+        if out_of_range_counts[i] > 0:
+            issues_found.append((col, int(out_of_range_counts[i])))
+            print(f"⚠ {col}: {out_of_range_counts[i]} values out of range [{min_val}, {max_val}]")
+            print(f"  Min: {col_min[i]}, Max: {col_max[i]}")
+        elif nan_counts[i] == 0:
+            print(f"✓ {col}: All values within range [{min_val}, {max_val}]")
+        else:
+            print(f"✓ {col}: All non-missing values within range [{min_val}, {max_val}]")
+        if nan_counts[i] > 0:
+            print(f"⚠ {col}: {nan_counts[i]} missing values not range-checked")
     
     if not issues_found:
         print("✓ All values are within expected ranges")
     
     return issues_found
 
-def validate_categorical_data(df):
+def validate_categorical_data(df, risk_counts):
     """Validate categorical data (risk levels)"""
     print("\n" + "="*50)
     print("CATEGORICAL DATA VALIDATION")
     print("="*50)
     
     if 'asthma_risk' in df.columns:
-        valid_risk_levels = ['Low', 'Moderate', 'High']
-        invalid_risks = df[~df['asthma_risk'].isin(valid_risk_levels)]
+        invalid_risks = df[~df['asthma_risk'].isin(RISK_LEVELS)]
         
         if len(invalid_risks) > 0:
             print(f"⚠ Invalid risk levels found: {invalid_risks['asthma_risk'].unique()}")
         else:
             print("✓ All risk levels are valid")
             print(f"Risk distribution:")
-            print(df['asthma_risk'].value_counts().sort_index())
+            print(risk_counts.sort_index())
     
-    return df['asthma_risk'].value_counts() if 'asthma_risk' in df.columns else None
+    return risk_counts
 
-def analyze_feature_correlations(df):
+def analyze_feature_correlations(df, numeric_cols, risk_codes):
     """Analyze correlations between features and target"""
     print("\n" + "="*50)
     print("FEATURE CORRELATION ANALYSIS")
     print("="*50)
     
-    # Encode categorical target for correlation analysis
-    df_encoded = df.copy()
-    if 'asthma_risk' in df_encoded.columns:
-        le = LabelEncoder()
-        df_encoded['asthma_risk_encoded'] = le.fit_transform(df_encoded['asthma_risk'])
+    # Correlate the numeric block and the risk codes in one NumPy pass, without copying the frame
+    numeric_columns = list(numeric_cols)
+    matrix = df[numeric_columns].to_numpy(dtype=np.float64)
+    if risk_codes is not None:
+        matrix = np.column_stack([matrix, risk_codes])
+        numeric_columns.append('asthma_risk_encoded')
     
     # Calculate correlations
-    numeric_columns = df_encoded.select_dtypes(include=[np.number]).columns
-    correlation_matrix = df_encoded[numeric_columns].corr()
+    correlation_matrix = pd.DataFrame(
+        np.corrcoef(matrix, rowvar=False), index=numeric_columns, columns=numeric_columns
+    )
     
     # Show correlations with target
     if 'asthma_risk_encoded' in correlation_matrix.columns:
@@ -135,7 +176,7 @@ def analyze_feature_correlations(df):
     
     return correlation_matrix
 
-def generate_summary_statistics(df):
+def generate_summary_statistics(df, numeric_cols):
     """Generate comprehensive summary statistics"""
     print("\n" + "="*50)
     print("SUMMARY STATISTICS")
@@ -143,17 +184,15 @@ def generate_summary_statistics(df):
     
     # Overall statistics
     print("Dataset Overview:")
-    print(df.describe())
+    print(df[numeric_cols].agg(SUMMARY_STATS).round(2))
     
-    # Risk level statistics
+    # Risk level statistics, all levels in one grouped pass
     if 'asthma_risk' in df.columns:
         print("\nStatistics by Risk Level:")
-        for risk_level in df['asthma_risk'].unique():
-            print(f"\n{risk_level} Risk:")
-            risk_data = df[df['asthma_risk'] == risk_level]
-            print(risk_data.describe().round(2))
+        stats = df.groupby('asthma_risk', observed=True)[numeric_cols].agg(SUMMARY_STATS).astype(float).round(2)
+        print(stats.T)
 
-def create_visualizations(df):
+def create_visualizations(df, risk_counts, risk_codes, correlation_matrix):
     """Create visualizations to understand the data"""
     print("\n" + "="*50)
     print("DATA VISUALIZATION")
@@ -165,7 +204,7 @@ def create_visualizations(df):
     fig.suptitle('Asthma Dataset Analysis', fontsize=16)
     
     # Risk level distribution
-    axes[0, 0].pie(df['asthma_risk'].value_counts(), labels=df['asthma_risk'].value_counts().index, autopct='%1.1f%%')
+    axes[0, 0].pie(risk_counts, labels=risk_counts.index, autopct='%1.1f%%')
     axes[0, 0].set_title('Risk Level Distribution')
     
     # PM2.5 distribution by risk level
@@ -175,7 +214,8 @@ def create_visualizations(df):
     axes[0, 1].set_ylabel('PM2.5 (μg/m³)')
     
     # Temperature vs Humidity scatter plot
-    scatter = axes[1, 0].scatter(df['temperature'], df['humidity'], c=pd.factorize(df['asthma_risk'])[0], alpha=0.6)
+    scatter = axes[1, 0].scatter(df['temperature'], df['humidity'], c=risk_codes, alpha=0.6,
+                             rasterized=True)
     axes[1, 0].set_xlabel('Temperature (°C)')
     axes[1, 0].set_ylabel('Humidity (%)')
     axes[1, 0].set_title('Temperature vs Humidity by Risk Level')
@@ -187,27 +227,20 @@ def create_visualizations(df):
     axes[1, 1].set_title('Medication Adherence Distribution')
     
     plt.tight_layout()
-    plt.savefig(os.path.join('datasets', 'data_analysis.png'), dpi=300, bbox_inches='tight')
+    plt.savefig(os.path.join('datasets', 'data_analysis.png'), dpi=PLOT_DPI, bbox_inches='tight')
+    plt.close(fig)
     print("Visualization saved as 'data_analysis.png'")
     
-    # Show correlation heatmap
+    # Show correlation heatmap, reusing the matrix from analyze_feature_correlations
     plt.figure(figsize=(12, 10))
-    numeric_df = df.select_dtypes(include=[np.number])
-    if 'asthma_risk' in df.columns:
-        # Encode asthma_risk for correlation
-        df_temp = df.copy()
-        le = LabelEncoder()
-        df_temp['asthma_risk_encoded'] = le.fit_transform(df_temp['asthma_risk'])
-        numeric_df = df_temp.select_dtypes(include=[np.number])
-    
-    correlation_matrix = numeric_df.corr()
     sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', center=0, fmt='.2f')
     plt.title('Feature Correlation Matrix')
     plt.tight_layout()
-    plt.savefig(os.path.join('datasets', 'correlation_heatmap.png'), dpi=300, bbox_inches='tight')
+    plt.savefig(os.path.join('datasets', 'correlation_heatmap.png'), dpi=PLOT_DPI, bbox_inches='tight')
+    plt.close()
     print("Correlation heatmap saved as 'correlation_heatmap.png'")
 
-def validate_dataset_completeness(df):
+def validate_dataset_completeness(df, risk_counts):
     """Validate that the dataset is complete and suitable for training"""
     print("\n" + "="*50)
     print("DATASET COMPLETENESS VALIDATION")
@@ -227,8 +260,7 @@ def validate_dataset_completeness(df):
         print("✓ All required columns present")
     
     # Check for sufficient samples per class
-    if 'asthma_risk' in df.columns:
-        risk_counts = df['asthma_risk'].value_counts()
+    if risk_counts is not None:
         min_samples = 50  # Minimum samples per class for good training
         insufficient_classes = risk_counts[risk_counts < min_samples]
         
@@ -240,8 +272,7 @@ def validate_dataset_completeness(df):
             print("✓ Sufficient samples for all risk classes")
     
     # Check for data balance
-    if 'asthma_risk' in df.columns:
-        risk_counts = df['asthma_risk'].value_counts()
+    if risk_counts is not None:
         max_count = risk_counts.max()
         min_count = risk_counts.min()
         balance_ratio = min_count / max_count
@@ -261,21 +292,29 @@ def main():
     if df is None:
         return
     
+    # Count and encode risk levels once; every check below reuses them
+    risk_counts = df['asthma_risk'].value_counts() if 'asthma_risk' in df.columns else None
+    risk_codes = (pd.Categorical(df['asthma_risk'], categories=RISK_LEVELS, ordered=True).codes
+                  if 'asthma_risk' in df.columns else None)
+    
+    # Resolve the numeric columns once instead of re-scanning dtypes in each check
+    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+    
     # Perform all validations
     missing_data, duplicates = check_data_quality(df)
     range_issues = validate_value_ranges(df)
-    risk_distribution = validate_categorical_data(df)
-    correlation_matrix = analyze_feature_correlations(df)
-    generate_summary_statistics(df)
+    risk_distribution = validate_categorical_data(df, risk_counts)
+    correlation_matrix = analyze_feature_correlations(df, numeric_cols, risk_codes)
+    generate_summary_statistics(df, numeric_cols)
     
     # Try to create visualizations (may fail if matplotlib backend issues)
     try:
-        create_visualizations(df)
+        create_visualizations(df, risk_counts, risk_codes, correlation_matrix)
     except Exception as e:
         print(f"Warning: Could not create visualizations: {e}")
     
     # Validate completeness
-    is_complete = validate_dataset_completeness(df)
+    is_complete = validate_dataset_completeness(df, risk_counts)
     
     # Summary
     print("\n" + "="*50)
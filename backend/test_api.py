@@ -6,10 +6,15 @@ Test script for AsthmaShield backend API
 import requests
 import json
 
-def test_api():
+def test_api(session=None):
     """Test the AsthmaShield backend API"""
     base_url = "http://localhost:8000/api"
     
+    # A pooled session keeps the connection alive across repeated calls
+    if session is None:
+        with requests.Session() as session:
+            return test_api(session)
+    
     # Test the predict endpoint with patient data
     print("Testing predict endpoint with patient data...")
     try:
@@ -19,7 +24,7 @@ def test_api():
             'patient_history_severe_attacks': 2,
             'medication_adherence': 0.8
         }
-        response = requests.get(f"{base_url}/predict/", params=params)
+        response = session.get(f"{base_url}/predict/", params=params, timeout=5)
         if response.status_code == 200:
             data = response.json()
             print("API Response:")
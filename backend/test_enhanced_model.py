@@ -6,10 +6,11 @@ import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
 import joblib
 import os
 
+RISK_LEVELS = ['Low', 'Moderate', 'High']
+
 def test_enhanced_model():
     """Test the enhanced model training process"""
     print("🧪 Testing Enhanced Asthma Risk Prediction Model")
@@ -32,9 +33,8 @@ def test_enhanced_model():
     X = df[feature_columns]
     y = df['asthma_risk']
     
-    # Encode target labels
-    le = LabelEncoder()
-    y_encoded = le.fit_transform(y)
+    # Encode target labels as ordered category codes (Low < Moderate < High)
+    y_encoded = pd.Categorical(y, categories=RISK_LEVELS, ordered=True).codes.astype(np.int8)
     
     # Split the data
     X_train, X_test, y_train, y_test = train_test_split(
@@ -57,7 +57,7 @@ def test_enhanced_model():
     print("\n🧪 Testing prediction...")
     test_sample = np.array([[92, 135, 31, 56, 50, 3.2, 1013, 35, 2, 0.8]])
     prediction_encoded = model.predict(test_sample)[0]
-    prediction = le.inverse_transform([prediction_encoded])[0]
+    prediction = RISK_LEVELS[prediction_encoded]
     
     print(f"📋 Test sample prediction: {prediction}")
     
@@ -66,7 +66,7 @@ def test_enhanced_model():
     model_dir = os.path.join('asthmashield_app', 'ml_model')
     
     joblib.dump(model, os.path.join(model_dir, 'random_forest_model.pkl'))
-    joblib.dump(le, os.path.join(model_dir, 'label_encoder.pkl'))
+    joblib.dump(RISK_LEVELS, os.path.join(model_dir, 'label_encoder.pkl'))
     joblib.dump(feature_columns, os.path.join(model_dir, 'feature_columns.pkl'))
     
     print("✅ Test model components saved successfully")
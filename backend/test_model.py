@@ -8,10 +8,11 @@ import os
 # Add the project root to the Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from asthmashield_app.ml_model.model import predict_asthma_risk
-
 def test_model_prediction():
     """Test model prediction with sample data"""
+    # Imported here so the model stack only loads when the test actually runs
+    from asthmashield_app.ml_model.model import predict_asthma_risk
+    
     print("Testing model prediction...")
     
     try:
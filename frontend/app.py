@@ -1,15 +1,64 @@
 import streamlit as st
 import requests
+import orjson
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from dotenv import load_dotenv
-from components.map_component import create_risk_map, add_city_marker
+from components.map_component import build_city_map
 from components.weather_card import display_weather_card, display_risk_card
 from components.symptom_report import render_symptom_report_form, render_symptom_trends
+from utils import top_k_by_abs
 from streamlit_folium import st_folium
 
 # Load environment variables
 load_dotenv()
 
+PREDICT_URL = "http://localhost:8000/api/predict/"
+
+@st.cache_resource
+def _session():
+    """Shared HTTP session so repeated calls reuse the backend connection"""
+    return requests.Session()
+
+@st.cache_data(ttl=300, show_spinner=False)
+def fetch_prediction(city, patient_age, patient_history_severe_attacks, medication_adherence, email, phone):
+    """Fetch a risk prediction; weather and AQI refresh every 5-15 minutes, so a 5 minute cache loses nothing"""
+    params = {
+        'city': city,
+        'patient_age': patient_age,
+        'patient_history_severe_attacks': patient_history_severe_attacks,
+        'medication_adherence': medication_adherence,
+        'email': email,
+        'phone': phone
+    }
+    response = _session().get(PREDICT_URL, params=params, timeout=10)
+    # Raising keeps error responses out of the cache
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+@st.cache_data
+def _load_css(path="assets/style.css"):
+    """Read the stylesheet once instead of on every rerun"""
+    with open(path) as f:
+        return f.read()
+
+@st.cache_resource
+def _executor():
+    """Worker threads for backend requests that overlap with page rendering"""
+    return ThreadPoolExecutor(max_workers=4)
+
+def submit_prediction(*args):
+    """Run fetch_prediction on a worker thread attached to this script run, returning its future"""
+    ctx = get_script_run_ctx()
+    
+    def run():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fetch_prediction(*args)
+    
+    return _executor().submit(run)
+
 # Set page config
 st.set_page_config(
     page_title="AsthmaShield - AI Asthma Risk Predictor",
@@ -18,8 +67,7 @@ st.set_page_config(
 )
 
 # Load custom CSS
-with open("assets/style.css") as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+st.markdown(f"<style>{_load_css()}</style>", unsafe_allow_html=True)
 
 # Main header
 st.markdown("<h1 class='main-header'>🌬️ AsthmaShield – AI Asthma Risk Predictor</h1>", unsafe_allow_html=True)
@@ -94,116 +142,108 @@ with col1:
     user_email = st.text_input("Email for alerts", "")
     user_phone = st.text_input("Phone for SMS alerts", "")
     
+    prediction = None
     if st.button("Check Risk", key="check_risk"):
         if city:
-            with st.spinner("Analyzing environmental and patient data..."):
-                try:
-                    # Call backend API
-                    backend_url = "http://localhost:8000/api/predict/"
-                    params = {
-                        'city': city,
-                        'patient_age': patient_age,
-                        'patient_history_severe_attacks': patient_history_severe_attacks,
-                        'medication_adherence': medication_adherence,
-                        'email': user_email,
-                        'phone': user_phone
-                    }
-                    response = requests.get(backend_url, params=params)
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        
-                        # Display data cards
-                        st.subheader("📊 Live Environmental Data")
-                        
-                        col_data1, col_data2 = st.columns(2)
-                        with col_data1:
-                            display_weather_card("🌡️ Temperature", f"{data['temperature']:.1f}", "°C", "🌡️", "#2196f3")
-                            display_weather_card("💨 PM2.5", f"{data['pm25']:.1f}", "μg/m³", "💨", "#f44336")
-                            display_weather_card("🌪️ Wind Speed", f"{data['wind_speed']:.1f}", "m/s", "🌪️", "#ff9800")
-                        
-                        with col_data2:
-                            display_weather_card("💧 Humidity", f"{data['humidity']:.1f}", "%", "💧", "#4caf50")
-                            display_weather_card("🏭 PM10", f"{data['pm10']:.1f}", "μg/m³", "🏭", "#ff5722")
-                            display_weather_card("📏 Pressure", f"{data['pressure']:.0f}", "hPa", "📏", "#9c27b0")
-                        
-                        # Display patient information
-                        st.subheader("👤 Patient Information")
-                        col_patient1, col_patient2, col_patient3 = st.columns(3)
-                        with col_patient1:
-                            display_weather_card("🎂 Age", f"{data['patient_age']}", "years", "🎂", "#3f51b5")
-                        with col_patient2:
-                            display_weather_card("⚠️ Severe Attacks", f"{data['patient_history_severe_attacks']}", "", "⚠️", "#f44336")
-                        with col_patient3:
-                            display_weather_card("💊 Adherence", f"{data['medication_adherence']*100:.0f}", "%", "💊", "#4caf50")
-                        
-                        # Display risk level
-                        st.subheader("⚠️ Asthma Risk Level")
-                        display_risk_card(data['asthma_risk'])
-                        
-                        # Display confidence and probabilities
-                        if data.get('confidence'):
-                            st.metric("Prediction Confidence", f"{data['confidence']*100:.1f}%")
-                        
-                        # Display XAI explanations
-                        if data.get('xai_explanations'):
-                            st.subheader("🔍 Why This Prediction?")
-                            xai_exp = data['xai_explanations']
-                            
-                            # Show top contributing factors
-                            if 'lime' in xai_exp and 'feature_weights' in xai_exp['lime']:
-                                st.write("**Top contributing factors (LIME):**")
-                                feature_weights = xai_exp['lime']['feature_weights']
-                                sorted_features = sorted(feature_weights.items(), key=lambda x: abs(x[1]), reverse=True)
-                                
-                                for feature, weight in sorted_features[:5]:
-                                    weight_pct = abs(weight) * 100
-                                    indicator = "⬆️" if weight > 0 else "⬇️"
-                                    st.write(f"{indicator} {feature}: {weight_pct:.1f}% impact")
-                            
-                            # Show SHAP values if available
-                            if 'shap' in xai_exp and 'feature_importance' in xai_exp['shap']:
-                                st.write("**Feature importance (SHAP):**")
-                                shap_importance = xai_exp['shap']['feature_importance']
-                                sorted_shap = sorted(shap_importance.items(), key=lambda x: abs(x[1]), reverse=True)
-                                
-                                for feature, importance in sorted_shap[:5]:
-                                    st.write(f"- {feature}: {importance:.3f}")
-                        
-                        # Display AI advice
-                        st.subheader("🤖 AI Health Advice")
-                        st.info(data['advice'])
-                        
-                        # Display local symptom reports
-                        if data.get('local_symptom_reports'):
-                            st.subheader("🩺 Community Reports")
-                            reports = data['local_symptom_reports']
-                            st.write(f"Recent reports in your area: {len(reports)}")
-                            # In a real implementation, you would visualize these reports
-                    else:
-                        st.error(f"Error fetching data: {response.status_code}")
-                except Exception as e:
-                    st.error(f"Error: {str(e)}")
+            # Start the request now so it runs while the map column renders
+            prediction = submit_prediction(city, patient_age, patient_history_severe_attacks,
+                                           medication_adherence, user_email, user_phone)
         else:
             st.warning("Please enter a city name")
 
 with col2:
     st.header("🗺️ Risk Map")
     
-    # Create a simple map centered on India
-    m = create_risk_map(20.5937, 78.9629, 5)
-    
-    # Add a marker for the selected city (Pune as default)
-    add_city_marker(m, 18.5204, 73.8567, "Pune", "High", {
-        'pm25': 92,
-        'temperature': 31
-    })
+    # Map centered on India with a marker for the selected city (Pune as default),
+    # built once and reused across reruns
+    m = build_city_map(18.5204, 73.8567, "Pune", "High", pm25=92, temperature=31)
     
     # Display the map using streamlit-folium
     st_folium(m, width=700, height=500)
     
     # Render symptom trends
-    render_symptom_trends()
+    render_symptom_trends(city or "Pune")
+
+# Prediction results, rendered into the left column once the request completes
+if prediction is not None:
+    with col1:
+        with st.spinner("Analyzing environmental and patient data..."):
+            try:
+                # Wait for the backend response (identical requests within the TTL are served from cache)
+                try:
+                    data = prediction.result()
+                except requests.HTTPError as e:
+                    data = None
+                    st.error(f"Error fetching data: {e.response.status_code}")
+                
+                if data is not None:
+                    # Display data cards
+                    st.subheader("📊 Live Environmental Data")
+                    
+                    col_data1, col_data2 = st.columns(2)
+                    with col_data1:
+                        display_weather_card("🌡️ Temperature", f"{data['temperature']:.1f}", "°C", "🌡️", "#2196f3")
+                        display_weather_card("💨 PM2.5", f"{data['pm25']:.1f}", "μg/m³", "💨", "#f44336")
+                        display_weather_card("🌪️ Wind Speed", f"{data['wind_speed']:.1f}", "m/s", "🌪️", "#ff9800")
+                    
+                    with col_data2:
+                        display_weather_card("💧 Humidity", f"{data['humidity']:.1f}", "%", "💧", "#4caf50")
+                        display_weather_card("🏭 PM10", f"{data['pm10']:.1f}", "μg/m³", "🏭", "#ff5722")
+                        display_weather_card("📏 Pressure", f"{data['pressure']:.0f}", "hPa", "📏", "#9c27b0")
+                    
+                    # Display patient information
+                    st.subheader("👤 Patient Information")
+                    col_patient1, col_patient2, col_patient3 = st.columns(3)
+                    with col_patient1:
+                        display_weather_card("🎂 Age", f"{data['patient_age']}", "years", "🎂", "#3f51b5")
+                    with col_patient2:
+                        display_weather_card("⚠️ Severe Attacks", f"{data['patient_history_severe_attacks']}", "", "⚠️", "#f44336")
+                    with col_patient3:
+                        display_weather_card("💊 Adherence", f"{data['medication_adherence']*100:.0f}", "%", "💊", "#4caf50")
+                    
+                    # Display risk level
+                    st.subheader("⚠️ Asthma Risk Level")
+                    display_risk_card(data['asthma_risk'])
+                    
+                    # Display confidence and probabilities
+                    if data.get('confidence'):
+                        st.metric("Prediction Confidence", f"{data['confidence']*100:.1f}%")
+                    
+                    # Display XAI explanations
+                    if data.get('xai_explanations'):
+                        st.subheader("🔍 Why This Prediction?")
+                        xai_exp = data['xai_explanations']
+                        
+                        # Show top contributing factors
+                        if 'lime' in xai_exp and 'feature_weights' in xai_exp['lime']:
+                            st.write("**Top contributing factors (LIME):**")
+                            feature_weights = xai_exp['lime']['feature_weights']
+                            
+                            for feature, weight in top_k_by_abs(feature_weights):
+                                weight_pct = abs(weight) * 100
+                                indicator = "⬆️" if weight > 0 else "⬇️"
+                                st.write(f"{indicator} {feature}: {weight_pct:.1f}% impact")
+                        
+                        # Show SHAP values if available
+                        if 'shap' in xai_exp and 'feature_importance' in xai_exp['shap']:
+                            st.write("**Feature importance (SHAP):**")
+                            shap_importance = xai_exp['shap']['feature_importance']
+                            
+                            for feature, importance in top_k_by_abs(shap_importance):
+                                st.write(f"- {feature}: {importance:.3f}")
+                    
+                    # Display AI advice
+                    st.subheader("🤖 AI Health Advice")
+                    st.info(data['advice'])
+                    
+                    # Display local symptom reports
+                    if data.get('local_symptom_reports'):
+                        st.subheader("🩺 Community Reports")
+                        reports = data['local_symptom_reports']
+                        st.write(f"Recent reports in your area: {len(reports)}")
+                        # In a real implementation, you would visualize these reports
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
 
 # Symptom reporting section
 st.header("🩺 Community Symptom Reporting")
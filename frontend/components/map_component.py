@@ -3,6 +3,7 @@ Map component for AsthmaShield
 """
 
 import folium
+import streamlit as st
 from streamlit_folium import st_folium
 
 def create_risk_map(center_lat=20.5937, center_lon=78.9629, zoom=5):
@@ -67,6 +68,33 @@ def add_city_marker(map_obj, lat, lon, city_name, risk_level, popup_info=None):
         fillOpacity=0.6
     ).add_to(map_obj)
 
+@st.cache_resource(show_spinner=False)
+def build_city_map(lat, lon, city_name, risk_level, pm25=None, temperature=None,
+                   center_lat=20.5937, center_lon=78.9629, zoom=5):
+    """
+    Build a risk map with one city marker, cached so reruns reuse the same map
+    
+    Args:
+        lat (float): City latitude
+        lon (float): City longitude
+        city_name (str): Name of the city
+        risk_level (str): Risk level (High, Moderate, Low)
+        pm25 (float): PM2.5 shown in the popup
+        temperature (float): Temperature shown in the popup
+        center_lat (float): Center latitude
+        center_lon (float): Center longitude
+        zoom (int): Initial zoom level
+    
+    Returns:
+        folium.Map: Map with the city marker added
+    """
+    m = create_risk_map(center_lat, center_lon, zoom)
+    add_city_marker(m, lat, lon, city_name, risk_level, {
+        'pm25': pm25 if pm25 is not None else 'N/A',
+        'temperature': temperature if temperature is not None else 'N/A'
+    })
+    return m
+
 def display_map(map_obj, width=700, height=500):
     """
     Display the map in Streamlit
@@ -4,67 +4,164 @@ Symptom reporting component for the AsthmaShield frontend
 
 import streamlit as st
 import requests
-import json
-from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+from concurrent.futures import ThreadPoolExecutor
+import orjson
 import time
+import uuid
 
+BACKEND_URL = "http://localhost:8000/api/symptom-report/"
+BATCH_URL = BACKEND_URL + "batch/"
+TRENDS_URL = BACKEND_URL + "trends/"
+GEOCODE_URL = "https://nominatim.openstreetmap.org/search"
+
+# Bit i of a report's symptom_mask is set when SYMPTOMS[i] is checked; the order matches the backend
+SYMPTOMS = (
+    ("Wheezing", "wheezing"),
+    ("Shortness of breath", "shortness_of_breath"),
+    ("Chest tightness", "chest_tightness"),
+    ("Coughing", "coughing"),
+    ("Difficulty sleeping", "difficulty_sleeping")
+)
+# Matches the backend's MAX_BATCH_REPORTS
+MAX_BATCH_SIZE = 100
+
+@st.cache_resource
+def _get_session():
+    """One pooled HTTP session per Streamlit process, so submissions reuse the backend connection"""
+    session = requests.Session()
+    session.headers.update({"Content-Type": "application/json"})
+    # Retry brief gateway errors a couple of times, quickly, rather than failing the submission;
+    # repeated reports are safe because the backend ignores duplicate report IDs
+    retries = Retry(total=2, backoff_factor=0.1, status_forcelist=(502, 503, 504),
+                    allowed_methods=frozenset(['GET', 'POST']))
+    # One pool per host (backend and geocoder), each sized for a burst of sessions submitting at once;
+    # pool_block=False opens an extra connection instead of waiting when a pool is exhausted
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=32, pool_block=False, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_resource
+def _executor():
+    """Single background worker, so report batches are posted in submission order"""
+    return ThreadPoolExecutor(max_workers=1)
+
+def _post_reports(reports):
+    response = _get_session().post(
+        BATCH_URL,
+        data=orjson.dumps(reports),
+        timeout=(2, 5)  # connect, read
+    )
+    response.raise_for_status()
+    return response
+
+def _check_submissions():
+    """Surface failed background POSTs from earlier runs and re-queue their reports"""
+    submissions = st.session_state.setdefault('_report_submissions', [])
+    for future, reports in [s for s in submissions if s[0].done()]:
+        submissions.remove((future, reports))
+        try:
+            future.result(timeout=0)
+        except Exception as e:
+            st.session_state.setdefault('_pending_reports', []).extend(reports)
+            st.toast(f"Error submitting symptom reports: {str(e)}", icon="⚠️")
+
+def _flush_pending_reports():
+    """Hand every queued report to the background worker now, in batches of MAX_BATCH_SIZE"""
+    pending = st.session_state.setdefault('_pending_reports', [])
+    if not pending:
+        return False
+    
+    # Each report goes out as soon as it is submitted; reports re-queued after a failed
+    # POST simply ride along in the same batch
+    submissions = st.session_state.setdefault('_report_submissions', [])
+    for start in range(0, len(pending), MAX_BATCH_SIZE):
+        batch = pending[start:start + MAX_BATCH_SIZE]
+        submissions.append((_executor().submit(_post_reports, batch), batch))
+    st.session_state['_pending_reports'] = []
+    return True
+
+@st.cache_data(ttl="5m", max_entries=32)
+def _fetch_recent_symptom_trends(city):
+    """Severity mix of recent reports near a city; fetched once per TTL rather than on every rerun"""
+    response = _get_session().get(TRENDS_URL, params={'city': city}, timeout=3)
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+@st.cache_data(ttl="24h", max_entries=1024)
+def _geocode(city):
+    """(lat, lon) of a city, or None if it isn't found; looked up once a day per city"""
+    response = _get_session().get(
+        GEOCODE_URL,
+        params={'q': city, 'format': 'json', 'limit': 1},
+        headers={'User-Agent': 'AsthmaShield/1.0'},  # Nominatim rejects anonymous clients
+        timeout=3
+    )
+    response.raise_for_status()
+    results = orjson.loads(response.content)
+    if not results:
+        return None
+    return float(results[0]['lat']), float(results[0]['lon'])
+
+@st.fragment
 def render_symptom_report_form():
-    """Render the symptom reporting form"""
+    """Render the symptom reporting form; submitting it reruns only this fragment, not the page"""
     st.subheader("🩺 Report Symptoms")
     st.info("Help improve air quality predictions by reporting your symptoms. All data is anonymous and used for research purposes only.")
     
-    # Symptom checkboxes
-    st.write("Select your current symptoms:")
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        wheezing = st.checkbox("Wheezing", key="wheezing")
-        shortness_of_breath = st.checkbox("Shortness of breath", key="shortness_of_breath")
-        chest_tightness = st.checkbox("Chest tightness", key="chest_tightness")
+    # Report earlier submissions, then retry anything they put back in the queue
+    _check_submissions()
+    _flush_pending_reports()
     
-    with col2:
-        coughing = st.checkbox("Coughing", key="coughing")
-        difficulty_sleeping = st.checkbox("Difficulty sleeping", key="difficulty_sleeping")
-    
-    # Severity slider
-    severity = st.select_slider(
-        "How severe are your symptoms?",
-        options=["Mild", "Moderate", "Severe"],
-        value="Mild"
-    )
-    
-    # Location (optional)
-    st.write("Location (optional):")
-    use_current_location = st.checkbox("Use my current location")
+    # Widgets inside a form don't rerun the script until the form is submitted
+    with st.form("symptom_form"):
+        # Symptom checkboxes
+        st.write("Select your current symptoms:")
+        col1, col2 = st.columns(2)
+        
+        symptom_mask = 0
+        for bit, (label, key) in enumerate(SYMPTOMS):
+            with col1 if bit < 3 else col2:
+                if st.checkbox(label, key=key):
+                    symptom_mask |= 1 << bit
+        
+        # Severity slider
+        severity = st.select_slider(
+            "How severe are your symptoms?",
+            options=["Mild", "Moderate", "Severe"],
+            value="Mild"
+        )
+        
+        # Location (optional); the city field is ignored when the current location is used,
+        # since a form can't show or hide widgets until it is submitted
+        st.write("Location (optional):")
+        use_current_location = st.checkbox("Use my current location")
+        city = st.text_input("City", "Pune")
+        
+        submitted = st.form_submit_button("Submit Symptom Report")
     
     lat, lon = None, None
     if use_current_location:
         # In a real implementation, you would get the actual location
         # For now, we'll use default values
         lat, lon = 18.5204, 73.8567  # Pune coordinates
-        st.info(f"Using location: {lat}, {lon}")
-    else:
-        # Manual location input
-        city = st.text_input("City", "Pune")
-        # In a real implementation, you would geocode the city to get coordinates
+    elif submitted and city.strip():
+        try:
+            lat, lon = _geocode(city.strip()) or (None, None)
+        except Exception:
+            # The report is still useful without coordinates
+            pass
     
-    # Submit button
-    if st.button("Submit Symptom Report"):
-        if not any([wheezing, shortness_of_breath, chest_tightness, coughing, difficulty_sleeping]):
+    if submitted:
+        if not symptom_mask:
             st.warning("Please select at least one symptom.")
             return
         
-        # Prepare symptom data
-        symptoms = {
-            "wheezing": wheezing,
-            "shortness_of_breath": shortness_of_breath,
-            "chest_tightness": chest_tightness,
-            "coughing": coughing,
-            "difficulty_sleeping": difficulty_sleeping
-        }
-        
         location = {}
         if lat and lon:
+            st.info(f"Using location: {lat}, {lon}")
             location = {
                 "latitude": lat,
                 "longitude": lon
@@ -72,43 +169,37 @@ def render_symptom_report_form():
         
         # Prepare report data
         report_data = {
-            "timestamp": datetime.now().isoformat(),
+            "report_key": uuid.uuid4().hex,  # idempotency key, resent unchanged on retry
+            "timestamp_ns": time.time_ns(),  # the backend stores it as ISO 8601
             "user_id": "anonymous",  # In a real app, this would be the actual user ID
-            "symptoms": symptoms,
+            "symptom_mask": symptom_mask,
             "location": location,
             "severity": severity
         }
         
-        # Send to backend
-        try:
-            backend_url = "http://localhost:8000/api/symptom-report/"
-            response = requests.post(
-                backend_url,
-                json=report_data,
-                headers={"Content-Type": "application/json"}
-            )
-            
-            if response.status_code == 200:
-                st.success("Symptom report submitted successfully! Thank you for contributing to asthma research.")
-                time.sleep(2)
-                st.experimental_rerun()
-            else:
-                st.error(f"Failed to submit report: {response.status_code}")
-        except Exception as e:
-            st.error(f"Error submitting report: {str(e)}")
+        # Send the report right away, together with anything still queued from a failed attempt
+        st.session_state.setdefault('_pending_reports', []).append(report_data)
+        _flush_pending_reports()
+        st.success("Symptom report submitted successfully! Thank you for contributing to asthma research.")
 
-def render_symptom_trends():
+def render_symptom_trends(city="Pune"):
     """Render symptom trends visualization"""
     st.subheader("📊 Community Symptom Trends")
     
-    # In a real implementation, you would fetch this data from the backend
-    # For now, we'll show a placeholder
-    st.info("Community symptom data will appear here once enough reports are collected.")
+    try:
+        trends = _fetch_recent_symptom_trends(city)
+    except Exception:
+        trends = None
+    
+    if not trends or not trends.get('total_reports'):
+        st.info("Community symptom data will appear here once enough reports are collected.")
+        return
     
-    # Example visualization (placeholder)
-    st.write("Recent symptom reports in your area:")
-    st.progress(0.4)  # Placeholder for actual data
-    st.caption("40% of reports indicate mild symptoms, 35% moderate, 25% severe")
+    share = trends['severity_share']
+    st.write(f"Recent symptom reports in your area ({trends['total_reports']}):")
+    st.progress(share.get('Low', 0.0))
+    st.caption(f"{share.get('Low', 0.0):.0%} of reports indicate mild symptoms, "
+               f"{share.get('Moderate', 0.0):.0%} moderate, {share.get('High', 0.0):.0%} severe")
 
 # For testing purposes
 if __name__ == "__main__":
@@ -0,0 +1,18 @@
+"""
+Shared helpers for the AsthmaShield frontend
+"""
+
+import heapq
+
+def top_k_by_abs(weights, k=5):
+    """
+    Return the k (feature, weight) pairs with the largest absolute weight
+    
+    Args:
+        weights (dict): Feature name to weight
+        k (int): Number of pairs to return
+    
+    Returns:
+        list: (feature, weight) pairs, largest magnitude first
+    """
+    return heapq.nlargest(k, weights.items(), key=lambda item: abs(item[1]))
@@ -16,16 +16,17 @@ setup(
         "djangorestframework>=3.14.0",
         "python-dotenv>=1.0.0",
         "requests>=2.31.0",
-        "numpy>=1.24.3",
-        "pandas>=2.0.3",
-        "scikit-learn>=1.3.0",
+        "orjson>=3.9",
+        "numpy>=1.24.3,<2.0",
+        "pandas>=2.0.3,<2.3",
+        "scikit-learn>=1.3.0,<1.5",
         "joblib>=1.3.2",
         "google-generativeai>=0.3.1",
         
         # Frontend requirements
-        "streamlit>=1.28.0",
+        "streamlit>=1.37.0",
         "folium>=0.14.0",
         "streamlit-folium>=0.15.0",
     ],
-    python_requires=">=3.8",
+    python_requires=">=3.9",
 )
\ No newline at end of file
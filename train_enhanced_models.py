@@ -4,8 +4,104 @@ Comprehensive script to enhance asthma risk prediction models
 
 import os
 import sys
-import subprocess
+import importlib
+import multiprocessing
 import time
+from functools import partial
+
+# Steps 2 and 3 only depend on the generated dataset; validation just reads it, so the
+# two can run side by side: (header, module, argv, timeout, label, error action)
+DATASET_STEPS = [
+    ("🔍 Step 2: Validating Dataset", 'validate_data', None, 300,
+     "Dataset validation", "validating dataset"),
+    ("🧠 Step 3: Training Enhanced Models", 'train_model', [], 600,
+     "Model training", "training models"),
+]
+
+class StepTimeout(Exception):
+    """Raised when a training step is still running after its time budget"""
+
+def run_script(module_name, argv=None):
+    """Import a pipeline script and call its main(); module-level so worker processes can run it"""
+    module = importlib.import_module(module_name)
+    try:
+        if argv is None:
+            module.main()
+        else:
+            module.main(argv)
+    except SystemExit as e:
+        # argparse and scripts exit instead of raising; only a non-zero status is a failure
+        if e.code:
+            raise RuntimeError(f"exited with status {e.code}")
+
+def _run_child(func, sender):
+    """Step process entry point; reports a failure's message to the parent before exiting"""
+    try:
+        func()
+    except Exception as e:
+        sender.send(str(e))
+        sys.exit(1)
+
+def start_step(func):
+    """Start a step in its own process so it can be terminated when it runs over time"""
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_run_child, args=(func, sender))
+    process.start()
+    sender.close()
+    return process, receiver
+
+def finish_step(process, receiver, deadline):
+    """Wait for a started step until the deadline, terminating it if it is still running"""
+    process.join(max(0, deadline - time.monotonic()))
+    if process.is_alive():
+        process.terminate()
+        process.join()
+        raise StepTimeout("terminated after running out of time")
+    if process.exitcode:
+        raise RuntimeError(receiver.recv() if receiver.poll() else f"exited with status {process.exitcode}")
+
+def run_step(func, timeout):
+    """Run a step in a child process, terminating it after the timeout and re-raising its error"""
+    start = time.monotonic()
+    finish_step(*start_step(func), start + timeout)
+    print(f"⏱ {time.monotonic() - start:.1f}s")
+
+def run_dataset_steps():
+    """Run validation and training in parallel processes, or in order on a single core"""
+    if (os.cpu_count() or 1) < 2:
+        for header, module, argv, timeout, label, action in DATASET_STEPS:
+            print(f"\n{header}")
+            print("-" * 40)
+            try:
+                run_step(partial(run_script, module, argv), timeout)
+                print(f"✅ {label} completed successfully")
+            except StepTimeout:
+                print(f"⚠ {label} timed out")
+            except Exception as e:
+                print(f"❌ Error {action}: {e}")
+        return
+    
+    for header, *_ in DATASET_STEPS:
+        print(f"\n{header}")
+    print("-" * 40)
+    print("Running in parallel; their output may interleave")
+    
+    # Each step gets its own process and its own budget; both are finished or terminated
+    # before this returns, so Step 4 never sees half-written artifacts
+    start = time.monotonic()
+    running = [
+        (start_step(partial(run_script, module, argv)), start + timeout, label, action)
+        for _, module, argv, timeout, label, action in DATASET_STEPS
+    ]
+    for (process, receiver), deadline, label, action in sorted(running, key=lambda step: step[1]):
+        try:
+            finish_step(process, receiver, deadline)
+            print(f"⏱ {time.monotonic() - start:.1f}s")
+            print(f"✅ {label} completed successfully")
+        except StepTimeout:
+            print(f"⚠ {label} timed out")
+        except Exception as e:
+            print(f"❌ Error {action}: {e}")
 
 def run_enhanced_training():
     """Run the complete enhanced training process"""
@@ -13,89 +109,33 @@ def run_enhanced_training():
     print("=" * 60)
     
     # Change to backend directory
-    backend_dir = os.path.join(os.path.dirname(__file__), 'backend')
+    backend_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
     os.chdir(backend_dir)
     
+    # Steps run as modules in child processes, which inherit this path
+    sys.path[:0] = [backend_dir, os.path.join(backend_dir, 'datasets')]
+    
     # Step 1: Generate enhanced dataset
     print("\n📊 Step 1: Generating Enhanced Dataset")
     print("-" * 40)
     try:
-        result = subprocess.run([
-            sys.executable, 
-            os.path.join('datasets', 'generate_data.py')
-        ], capture_output=True, text=True, timeout=300)
-        
-        if result.returncode == 0:
-            print("✅ Dataset generation completed successfully")
-            print(result.stdout)
-        else:
-            print("⚠ Dataset generation completed with warnings")
-            print(result.stdout)
-            print(result.stderr)
-    except subprocess.TimeoutExpired:
+        run_step(partial(run_script, 'generate_data', []), timeout=300)
+        print("✅ Dataset generation completed successfully")
+    except StepTimeout:
         print("⚠ Dataset generation timed out")
     except Exception as e:
         print(f"❌ Error generating dataset: {e}")
     
-    # Step 2: Validate dataset
-    print("\n🔍 Step 2: Validating Dataset")
-    print("-" * 40)
-    try:
-        result = subprocess.run([
-            sys.executable, 
-            os.path.join('datasets', 'validate_data.py')
-        ], capture_output=True, text=True, timeout=300)
-        
-        if result.returncode == 0:
-            print("✅ Dataset validation completed successfully")
-            print(result.stdout)
-        else:
-            print("⚠ Dataset validation completed with warnings")
-            print(result.stdout)
-            print(result.stderr)
-    except subprocess.TimeoutExpired:
-        print("⚠ Dataset validation timed out")
-    except Exception as e:
-        print(f"❌ Error validating dataset: {e}")
-    
-    # Step 3: Train enhanced models
-    print("\n🧠 Step 3: Training Enhanced Models")
-    print("-" * 40)
-    try:
-        result = subprocess.run([
-            sys.executable, 
-            'train_model.py'
-        ], capture_output=True, text=True, timeout=600)
-        
-        if result.returncode == 0:
-            print("✅ Model training completed successfully")
-            print(result.stdout)
-        else:
-            print("⚠ Model training completed with warnings")
-            print(result.stdout)
-            print(result.stderr)
-    except subprocess.TimeoutExpired:
-        print("⚠ Model training timed out")
-    except Exception as e:
-        print(f"❌ Error training models: {e}")
+    # Steps 2 and 3: Validate dataset and train enhanced models
+    run_dataset_steps()
     
     # Step 4: Test the trained model
     print("\n🧪 Step 4: Testing Trained Model")
     print("-" * 40)
     try:
-        result = subprocess.run([
-            sys.executable, 
-            os.path.join('asthmashield_app', 'ml_model', 'model.py')
-        ], capture_output=True, text=True, timeout=60)
-        
-        if result.returncode == 0:
-            print("✅ Model testing completed successfully")
-            print(result.stdout)
-        else:
-            print("⚠ Model testing completed with warnings")
-            print(result.stdout)
-            print(result.stderr)
-    except subprocess.TimeoutExpired:
+        run_step(partial(run_script, 'asthmashield_app.ml_model.model'), timeout=60)
+        print("✅ Model testing completed successfully")
+    except StepTimeout:
         print("⚠ Model testing timed out")
     except Exception as e:
         print(f"❌ Error testing model: {e}")